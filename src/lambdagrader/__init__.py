@@ -19,6 +19,43 @@ from .core import (
     add_graded_result,
     save_graded_notebook_to_html
 )
+from .result_store import (
+    open_result_store,
+    insert_graded_result,
+    insert_graded_results,
+    get_graded_result,
+    find_submissions,
+    find_submissions_by_test_case,
+    export_gradebook
+)
+from .preflight import (
+    find_syntax_errors,
+    compare_test_cases_with_manifest,
+    is_empty_submission,
+    is_unmodified_starter,
+    run_preflight_checks,
+    create_graded_result_from_manifest,
+    add_failed_test_cases_to_graded_result
+)
+from .partial_execution import (
+    analyze_cell_dependencies,
+    select_cells_to_execute,
+    mark_cells_to_skip
+)
+from .workspace import (
+    stage_data_file,
+    stage_data_files,
+    data_cache,
+    submission_working_dir
+)
+from .grader import (
+    load_notebook_for_grading,
+    summarize_cell_profiles,
+    execute_notebook_for_grading,
+    save_graded_outputs,
+    grade_notebook
+)
+from .pipeline import grade_notebooks_pipelined
 
 __all__ = [
     add_num,
@@ -37,5 +74,32 @@ __all__ = [
     get_test_cases_hash,
     generate_text_summary,
     add_graded_result,
-    save_graded_notebook_to_html
+    save_graded_notebook_to_html,
+    open_result_store,
+    insert_graded_result,
+    insert_graded_results,
+    get_graded_result,
+    find_submissions,
+    find_submissions_by_test_case,
+    export_gradebook,
+    find_syntax_errors,
+    compare_test_cases_with_manifest,
+    is_empty_submission,
+    is_unmodified_starter,
+    run_preflight_checks,
+    create_graded_result_from_manifest,
+    add_failed_test_cases_to_graded_result,
+    analyze_cell_dependencies,
+    select_cells_to_execute,
+    mark_cells_to_skip,
+    stage_data_file,
+    stage_data_files,
+    data_cache,
+    submission_working_dir,
+    load_notebook_for_grading,
+    summarize_cell_profiles,
+    execute_notebook_for_grading,
+    save_graded_outputs,
+    grade_notebook,
+    grade_notebooks_pipelined
 ]
\ No newline at end of file
@@ -14,6 +14,7 @@ test_case_name_pattern = r'^\s*_test_case\s*=\s*[\'"](.*)[\'"]'
 test_case_points_pattern = r'^\s*_points\s*=\s*(.*)[\s#]*.*[\r\n]'
 manual_grading_pattern = r'^\s*_grade_manually\s*=\s*(True|False)'
 graded_results_element_id = '_graded_results'
+slowest_cells_element_id = '_slowest_cells'
 
 CWD = os.path.realpath(os.path.dirname(__file__))
 CELL_SCRIPTS_PATH = os.path.join(CWD, 'jupyter-cell-scripts')
@@ -125,9 +126,25 @@ def preprocess_test_case_cells(nb):
 
             
 
-def add_grader_scripts(nb):
+def add_grader_scripts(nb, headless=False, headless_frames=False, profiling=False, profiling_threshold_in_seconds=1.0):
     with open(os.path.join(CELL_SCRIPTS_PATH, 'prepend-to-start-of-notebook.py')) as f:
         prepend_script = f.read()
+        
+        # headless mode stubs out plotly and matplotlib rendering inside the kernel
+        # headless_frames additionally skips rich display of large pandas DataFrames
+        if headless:
+            prepend_script = prepend_script.replace('is_lambdagrader_headless = False', 'is_lambdagrader_headless = True')
+        if headless_frames:
+            prepend_script = prepend_script.replace('is_lambdagrader_headless_frames = False', 'is_lambdagrader_headless_frames = True')
+            
+        # profiling mode records per-cell timing and samples the stacks of slow cells
+        if profiling:
+            prepend_script = prepend_script.replace('is_lambdagrader_profiling = False', 'is_lambdagrader_profiling = True')
+            prepend_script = prepend_script.replace(
+                '_profiling_threshold_in_seconds = 1.0',
+                f'_profiling_threshold_in_seconds = {float(profiling_threshold_in_seconds)}'
+            )
+        
         prepend_cell = new_code_cell(prepend_script)
     
     with open(os.path.join(CELL_SCRIPTS_PATH, 'append-to-end-of-notebook.py')) as f:
@@ -265,6 +282,26 @@ def add_graded_result(nb, graded_result):
     if gr['num_manually_graded_cases'] == 0:
         del gr_dict_for_df['Pending Test Cases']
     
+    # only available when graded with pre-flight checks enabled
+    preflight_warnings = []
+    
+    if gr.get('preflight'):
+        if gr['preflight']['test_cases_hash_matches'] is False:
+            preflight_warnings.append('Test cases checksum does not match the assignment')
+        if gr['preflight']['missing_test_cases']:
+            preflight_warnings.append(f"Missing test cases: {', '.join(gr['preflight']['missing_test_cases'])}")
+        if gr['preflight']['modified_test_cases']:
+            preflight_warnings.append(f"Modified test cases: {', '.join(gr['preflight']['modified_test_cases'])}")
+        if gr['preflight']['unexpected_test_cases']:
+            preflight_warnings.append(f"Unexpected test cases: {', '.join(gr['preflight']['unexpected_test_cases'])}")
+        if gr['preflight']['is_empty_submission']:
+            preflight_warnings.append('Empty submission')
+        if gr['preflight']['is_unmodified_starter']:
+            preflight_warnings.append('Unmodified starter notebook')
+    
+    if preflight_warnings:
+        gr_dict_for_df['⚠️ Pre-flight Warnings'] = '<br>'.join(preflight_warnings)
+    
     df_metadata = pd.DataFrame({
         'item': gr_dict_for_df.keys(),
         'description': gr_dict_for_df.values()
@@ -309,6 +346,28 @@ def add_graded_result(nb, graded_result):
     df_r.drop(columns=['test_case_link', 'grade_manually'], inplace=True)
 
     gr_cells.append(new_markdown_cell(df_r.to_markdown()))
+    
+    # only available when graded with profiling enabled
+    if gr.get('slowest_cells'):
+        gr_cells.append(new_markdown_cell(f'<h2 id="{slowest_cells_element_id}">Slowest cells</h2>'))
+        
+        slowest_cells_rows = []
+        
+        for o in gr['slowest_cells']:
+            hotspots = [
+                f"`{h['function']}` ({os.path.basename(h['filename'])}:{h['lineno']}) ~{h['self_time_in_seconds']}s"
+                for h in o['hotspots'][:3]
+            ]
+            
+            slowest_cells_rows.append({
+                'cell': f"<a href='#_slow_cell_{o['execution_count']}'>[{o['execution_count']}]</a>",
+                'type': f"Test case {o['test_case_name']}" if o['test_case_name'] else 'Learner code',
+                'duration_in_seconds': o['duration_in_seconds'],
+                'top_hotspots': '<br>'.join(hotspots),
+            })
+            
+        gr_cells.append(new_markdown_cell(pd.DataFrame(slowest_cells_rows).to_markdown(index=False)))
+    
     gr_cells.append(new_markdown_cell('\n---\n'))
     
     nb.cells = gr_cells + nb.cells
@@ -349,6 +408,17 @@ def save_graded_notebook_to_html(nb, html_title, output_path, graded_result):
             
             # add "back to top" link
             el.append(copy.copy(back_to_top_link_el))
+    
+    # add in-page anchors for the slowest cells
+    # code cells are rendered in the same order as they appear in the notebook
+    slow_execution_counts = set(o['execution_count'] for o in graded_result.get('slowest_cells', []))
+    code_cells = [cell for cell in nb.cells if cell.cell_type == 'code']
+    
+    for el, cell in zip(elements, code_cells):
+        if cell.get('execution_count') in slow_execution_counts:
+            slow_cell_anchor_el = soup.new_tag("a")
+            slow_cell_anchor_el['id'] = f"_slow_cell_{cell['execution_count']}"
+            el.insert(0, slow_cell_anchor_el)
             
     lambda_grader_sidebar_container_el = soup.new_tag("div")
     lambda_grader_sidebar_container_el['class'] = 'lambda-grader-sidebar-container'
@@ -362,6 +432,14 @@ def save_graded_notebook_to_html(nb, html_title, output_path, graded_result):
     ).find('a')
     lambda_grader_sidebar_container_el.append(back_to_top_el)
     
+    if slow_execution_counts:
+        slowest_cells_link_el = soup.new_tag("a")
+        slowest_cells_link_el.string = '⏱'
+        slowest_cells_link_el['class'] = 'graded-item-link slowest-cells'
+        slowest_cells_link_el['href'] = f'#{slowest_cells_element_id}'
+        slowest_cells_link_el['data-text'] = 'Slowest cells'
+        lambda_grader_sidebar_container_el.append(slowest_cells_link_el)
+    
     
     tc_counts = {}
     
@@ -420,6 +498,9 @@ html {
 .graded-item-link.back-to-top {
   background-color: #2196f3;
 }
+.graded-item-link.slowest-cells {
+  background-color: #9c27b0;
+}
 .graded-item-link.pass {
   border-right: 8px solid #4caf50;
 }
@@ -462,6 +543,9 @@ html {
 .graded-item-link.back-to-top:before {
   border-color: #2196f3;
 }
+.graded-item-link.slowest-cells:before {
+  border-color: #9c27b0;
+}
 .graded-item-link.pass:before {
   border-color: #4caf50;
 }
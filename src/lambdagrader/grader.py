@@ -0,0 +1,342 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import platform
+from pathlib import Path
+import nbformat
+from nbclient import NotebookClient
+from .core import (
+    extract_test_case_metadata_from_cell,
+    convert_test_case_using_grader_template,
+    add_grader_scripts,
+    remove_grader_scripts,
+    extract_test_cases_metadata_from_notebook,
+    extract_user_code_from_notebook,
+    get_test_cases_hash,
+    add_graded_result,
+    save_graded_notebook_to_html
+)
+from .partial_execution import (
+    skip_execution_tag,
+    select_cells_to_execute,
+    mark_cells_to_skip
+)
+from .workspace import default_staging_methods, submission_working_dir
+from .preflight import (
+    run_preflight_checks,
+    create_graded_result_from_manifest,
+    add_failed_test_cases_to_graded_result
+)
+
+grader_output_file_name = 'lambdagrader-result.json'
+
+
+
+def load_notebook_for_grading(notebook_path, strip_outputs=False, strip_attachments=False, validate=True):
+    with open(notebook_path, 'rb') as f:
+        notebook_bytes = f.read()
+
+    # hash the original bytes before anything is stripped
+    submission_notebook_hash = hashlib.md5(notebook_bytes).hexdigest()
+
+    # outputs are discarded cell by cell while the JSON is decoded
+    # so that the previous outputs of the whole notebook never sit in memory at once
+    def strip_cell(d):
+        if 'cell_type' in d:
+            if strip_outputs and 'outputs' in d:
+                d['outputs'] = []
+                d['execution_count'] = None
+            if strip_attachments:
+                d.pop('attachments', None)
+
+        return d
+
+    nb_dict = json.loads(
+        notebook_bytes,
+        object_hook=strip_cell if (strip_outputs or strip_attachments) else None
+    )
+    del notebook_bytes
+
+    # same steps as nbformat.reads, with schema validation being optional
+    major, minor = nbformat.reader.get_version(nb_dict)
+    nb = nbformat.versions[major].to_notebook_json(nb_dict, minor=minor)
+    nb = nbformat.convert(nb, 4)
+
+    if validate:
+        try:
+            nbformat.validate(nb)
+        except nbformat.ValidationError as e:
+            nbformat.get_logger().error("Notebook JSON is invalid: %s", e)
+
+    return nb, submission_notebook_hash
+
+
+
+def add_grader_metadata(graded_result, notebook_path, submission_notebook_hash, test_cases_hash) -> dict:
+    # add filename
+    # we add it here instead of trying to add it within the Jupyter notebook
+    # because it is tricky to grab the current file name inside a Jupyter kernel
+    graded_result['filename'] = Path(notebook_path).name
+
+    # MD5 hash of the submitted Jupyter notebook file
+    # this can be used to detect duplicate submission to prevent unnecessary re-grading
+    graded_result['submission_notebook_hash'] = submission_notebook_hash
+
+    # MD5 hash of test cases code
+    # this helps us to identify any potential cases
+    # where a learner has modified or deleted the test cases code cell
+    graded_result['test_cases_hash'] = test_cases_hash
+
+    # store Python version and platform used to run the notebook
+    graded_result['grader_python_version'] = f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
+    graded_result['grader_platform'] = platform.platform()
+
+    return graded_result
+
+
+
+def summarize_cell_profiles(nb, graded_result, num_slowest_cells=10) -> dict:
+    # turn the per-cell profiles recorded inside the kernel into a "slowest cells" list
+    cell_profiles = graded_result.pop('cell_profiles', [])
+    cells_by_execution_count = {
+        cell.execution_count: cell for cell in nb.cells
+        if cell.cell_type == 'code' and cell.get('execution_count') is not None
+    }
+    cell_profiles = [o for o in cell_profiles if o['execution_count'] in cells_by_execution_count]
+    slowest_cells = []
+
+    for o in sorted(cell_profiles, key=lambda x: x['duration_in_seconds'], reverse=True)[:num_slowest_cells]:
+        test_case_metadata = extract_test_case_metadata_from_cell(cells_by_execution_count[o['execution_count']].source)
+
+        slowest_cells.append({
+            'execution_count': o['execution_count'],
+            'test_case_name': test_case_metadata['test_case'] if test_case_metadata else None,
+            'duration_in_seconds': o['duration_in_seconds'],
+            'hotspots': o['hotspots'],
+        })
+
+    graded_result['slowest_cells'] = slowest_cells
+
+    return graded_result
+
+
+
+def get_preflight_graded_result(preflight_result, manifest=None, starter_graded_result=None) -> dict:
+    # returns a graded result if the outcome of a submission is known without
+    # executing it, None otherwise
+    if manifest and not preflight_result['has_test_cases']:
+        return create_graded_result_from_manifest(
+            manifest,
+            'LambdaGrader: The test case cell is missing from the submission'
+        )
+
+    if starter_graded_result is not None and preflight_result['is_unmodified_starter'] \
+            and preflight_result['test_cases_hash_matches']:
+        return json.loads(json.dumps(starter_graded_result))
+
+    return None
+
+
+
+def execute_notebook_for_grading(
+    notebook_path,
+    timeout=600,
+    kernel_name='python3',
+    preflight=False,
+    manifest=None,
+    expected_test_cases_hash=None,
+    starter_nb=None,
+    starter_graded_result=None,
+    known_graded_results=None,
+    partial_execution=False,
+    headless=False,
+    headless_frames=False,
+    fast_load=False,
+    profiling=False,
+    profiling_threshold_in_seconds=1.0,
+    working_dir=None
+):
+    grading_start_time = time.time()
+
+    # previous outputs and attachments are thrown away when the notebook is re-executed
+    nb, submission_notebook_hash = load_notebook_for_grading(
+        notebook_path,
+        strip_outputs=fast_load,
+        strip_attachments=fast_load,
+        validate=not fast_load
+    )
+
+    graded_result = None
+    preflight_result = None
+    broken_test_cells = []
+
+    if preflight:
+        # pass a precomputed manifest and hash when grading a batch
+        # to avoid re-processing the starter notebook for every submission
+        if starter_nb is not None:
+            manifest = manifest if manifest is not None else extract_test_cases_metadata_from_notebook(starter_nb)
+            expected_test_cases_hash = expected_test_cases_hash or get_test_cases_hash(starter_nb)
+
+        preflight_result = run_preflight_checks(
+            nb,
+            manifest=manifest,
+            expected_test_cases_hash=expected_test_cases_hash,
+            starter_nb=starter_nb
+        )
+        test_cases_hash = preflight_result['test_cases_hash']
+
+        # identical bytes were already graded (e.g., a resubmission)
+        if known_graded_results and submission_notebook_hash in known_graded_results:
+            graded_result = json.loads(json.dumps(known_graded_results[submission_notebook_hash]))
+        else:
+            graded_result = get_preflight_graded_result(preflight_result, manifest, starter_graded_result)
+
+        # test case cells that do not compile never reach _record_test_case
+        broken_test_cells = [o for o in preflight_result['syntax_errors'] if o['is_test_case']]
+    else:
+        test_cases_hash = get_test_cases_hash(nb)
+
+    broken_cell_indices = set(o['cell_index'] for o in broken_test_cells)
+
+    # only run the cells that test cases depend on
+    # falls back to executing every cell if the analysis can't be sure
+    if partial_execution and graded_result is None:
+        cell_indices_to_execute = select_cells_to_execute(nb)
+
+        if cell_indices_to_execute is not None:
+            mark_cells_to_skip(nb, cell_indices_to_execute)
+
+    for cell_index, cell in enumerate(nb.cells):
+        if cell_index not in broken_cell_indices:
+            convert_test_case_using_grader_template(cell)
+
+    add_grader_scripts(
+        nb,
+        headless=headless,
+        headless_frames=headless_frames,
+        profiling=profiling,
+        profiling_threshold_in_seconds=profiling_threshold_in_seconds
+    )
+
+    if graded_result is None:
+        client = NotebookClient(
+            nb,
+            timeout=timeout,
+            kernel_name=kernel_name,
+            allow_errors=True,
+            skip_cells_with_tag=skip_execution_tag,
+            # the kernel runs in working_dir (defaults to the current working directory)
+            resources={'metadata': {'path': working_dir}} if working_dir else {}
+        )
+        client.execute()
+
+        # running the notebook will store the graded result to a JSON file
+        graded_result_json_path = os.path.join(working_dir or '', grader_output_file_name)
+        with open(graded_result_json_path, mode='r') as f:
+            graded_result = json.load(f)
+        os.remove(graded_result_json_path)
+
+        if profiling:
+            summarize_cell_profiles(nb, graded_result)
+
+        if broken_test_cells:
+            add_failed_test_cases_to_graded_result(
+                graded_result,
+                [extract_test_case_metadata_from_cell(nb.cells[o['cell_index'] + 1].source) for o in broken_test_cells],
+                'LambdaGrader: The test case cell contains a syntax error'
+            )
+
+        # test cases deleted by the learner still count towards the maximum score
+        if preflight_result and preflight_result['missing_test_cases']:
+            add_failed_test_cases_to_graded_result(
+                graded_result,
+                [
+                    next(tc for tc in manifest if tc['test_case'] == test_case_name)
+                    for test_case_name in preflight_result['missing_test_cases']
+                ],
+                'LambdaGrader: The test case cell is missing from the submission'
+            )
+    else:
+        graded_result['grading_duration_in_seconds'] = round(time.time() - grading_start_time, 2)
+
+    add_grader_metadata(graded_result, notebook_path, submission_notebook_hash, test_cases_hash)
+
+    # keep the pre-flight findings so that instructors can review
+    # submissions with modified, missing or unexpected test cases
+    if preflight_result is not None:
+        graded_result['preflight'] = {
+            'test_cases_hash_matches': preflight_result['test_cases_hash_matches'],
+            'missing_test_cases': preflight_result['missing_test_cases'],
+            'unexpected_test_cases': preflight_result['unexpected_test_cases'],
+            'modified_test_cases': preflight_result['modified_test_cases'],
+            'is_empty_submission': preflight_result['is_empty_submission'],
+            'is_unmodified_starter': preflight_result['is_unmodified_starter'],
+            'syntax_errors': preflight_result['syntax_errors'],
+        }
+
+    return nb, graded_result
+
+
+
+def save_graded_outputs(nb, graded_result, notebook_path, output_dir=None) -> dict:
+    p = Path(notebook_path)
+    output_dir = output_dir or str(p.parent)
+    output_path_prefix = os.path.join(output_dir, p.stem)
+
+    # save graded notebook
+    with open(output_path_prefix + '-graded.ipynb', mode='w', encoding='utf-8') as f:
+        nbformat.write(nb, f)
+
+    with open(output_path_prefix + '-result.json', 'w') as f:
+        json.dump(graded_result, f, indent=2)
+
+    # clean up notebook
+    remove_grader_scripts(nb)
+    add_graded_result(nb, graded_result)
+
+    # extract user code to a Python file
+    with open(output_path_prefix + '_user_code.py', 'w', encoding='utf-8') as f:
+        f.write(extract_user_code_from_notebook(nb))
+
+    # store graded result to HTML
+    save_graded_notebook_to_html(
+        nb,
+        html_title=p.name,
+        output_path=output_path_prefix + '-graded.html',
+        graded_result=graded_result
+    )
+
+    return graded_result
+
+
+
+def grade_notebook(
+    notebook_path,
+    output_dir=None,
+    isolated=False,
+    data_paths=None,
+    base_dir=None,
+    methods=default_staging_methods,
+    data_cache_dir=None,
+    **kwargs
+) -> dict:
+    # isolated=True runs the kernel in a scratch directory of its own
+    # so that many submissions from the same folder can be graded at once
+    # the scratch directory is created in base_dir (defaults to next to the first data path)
+    # and data_paths are staged into it using the first of methods that works
+    # when grading a batch, pass the data_cache_dir of a data_cache(data_paths) instead
+    # so that the dataset is copied once rather than once per submission
+    if isolated:
+        with submission_working_dir(
+            data_paths,
+            base_dir=base_dir,
+            methods=methods,
+            data_cache_dir=data_cache_dir
+        ) as working_dir:
+            nb, graded_result = execute_notebook_for_grading(notebook_path, working_dir=working_dir, **kwargs)
+    else:
+        nb, graded_result = execute_notebook_for_grading(notebook_path, **kwargs)
+
+    return save_graded_outputs(nb, graded_result, notebook_path, output_dir=output_dir)
@@ -22,6 +22,198 @@ _graded_result = {
 
 is_lambdagrader_env = True
 
+# grading mode switches (set by add_grader_scripts)
+is_lambdagrader_headless = False
+is_lambdagrader_headless_frames = False
+is_lambdagrader_profiling = False
+_profiling_threshold_in_seconds = 1.0
+_profiling_num_hotspots = 10
+_profiling_sampling_interval_in_seconds = 0.01
+
+_original_renderers = {}
+
+def _close_figures_after_cell(result):
+    # the inline backend closes all figures at the end of each cell, Agg doesn't
+    # closing them here keeps plt.gcf() and plt.gca() in later cells identical in both modes
+    import sys
+    
+    if 'matplotlib.pyplot' in sys.modules:
+        sys.modules['matplotlib.pyplot'].close('all')
+
+def _enable_matplotlib_headless(gui=None):
+    # replaces get_ipython().enable_matplotlib while rendering is disabled
+    # so that %matplotlib inline in the notebook doesn't switch pyplot back to the inline backend
+    import matplotlib.pyplot
+    
+    matplotlib.pyplot.switch_backend('agg')
+    
+    return gui, 'agg'
+
+def _disable_rendering():
+    import os
+    import sys
+    import warnings
+    import importlib.util
+    
+    # matplotlib: use the non-interactive Agg backend so that figures are never rasterized
+    # ipykernel points MPLBACKEND to the inline backend, which pyplot reads when it is imported
+    _original_renderers.setdefault('MPLBACKEND', os.environ.get('MPLBACKEND'))
+    os.environ['MPLBACKEND'] = 'agg'
+    warnings.filterwarnings('ignore', message='.*non-interactive, and thus cannot be shown')
+    
+    if 'matplotlib.pyplot' in sys.modules:
+        sys.modules['matplotlib.pyplot'].switch_backend('agg')
+    
+    if 'enable_matplotlib' not in _original_renderers:
+        _original_renderers['enable_matplotlib'] = get_ipython().enable_matplotlib
+        get_ipython().enable_matplotlib = _enable_matplotlib_headless
+    
+    if 'close_figures_after_cell' not in _original_renderers:
+        _original_renderers['close_figures_after_cell'] = True
+        get_ipython().events.register('post_run_cell', _close_figures_after_cell)
+    
+    # plotly: figures are still built (test cases can inspect them) but never serialized
+    if importlib.util.find_spec('plotly') is not None:
+        import plotly.io
+        from plotly.basedatatypes import BaseFigure
+        
+        _original_renderers.setdefault('plotly', (BaseFigure.show, BaseFigure._ipython_display_, plotly.io.show))
+        BaseFigure.show = lambda self, *args, **kwargs: None
+        BaseFigure._ipython_display_ = lambda self: None
+        plotly.io.show = lambda *args, **kwargs: None
+    
+    # pandas: show df.info() instead of rendering frames that don't fit the display limits
+    if is_lambdagrader_headless_frames and importlib.util.find_spec('pandas') is not None:
+        import pandas
+        
+        _original_renderers.setdefault('large_repr', pandas.get_option('display.large_repr'))
+        pandas.set_option('display.large_repr', 'info')
+
+def _enable_rendering():
+    # test cases that need real figures can opt back in by calling _enable_rendering()
+    import os
+    import sys
+    
+    if 'MPLBACKEND' in _original_renderers:
+        mpl_backend = _original_renderers.pop('MPLBACKEND')
+        
+        if mpl_backend is None:
+            os.environ.pop('MPLBACKEND', None)
+        else:
+            os.environ['MPLBACKEND'] = mpl_backend
+            
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].switch_backend(mpl_backend or 'module://matplotlib_inline.backend_inline')
+    
+    if 'enable_matplotlib' in _original_renderers:
+        get_ipython().enable_matplotlib = _original_renderers.pop('enable_matplotlib')
+    
+    if _original_renderers.pop('close_figures_after_cell', False):
+        get_ipython().events.unregister('post_run_cell', _close_figures_after_cell)
+    
+    if 'plotly' in _original_renderers:
+        import plotly.io
+        from plotly.basedatatypes import BaseFigure
+        
+        BaseFigure.show, BaseFigure._ipython_display_, plotly.io.show = _original_renderers.pop('plotly')
+    
+    if 'large_repr' in _original_renderers:
+        import pandas
+        
+        pandas.set_option('display.large_repr', _original_renderers.pop('large_repr'))
+
+if is_lambdagrader_headless:
+    _disable_rendering()
+
+if is_lambdagrader_profiling:
+    import sys
+    import time
+    import threading
+    from collections import Counter
+    
+    # cells are timed with no profiler attached, so durations carry no profiling overhead
+    # once a cell runs longer than _profiling_threshold_in_seconds, a background thread
+    # samples the main thread's stack to find hotspots
+    # sys.setprofile is never used, so cProfile and %prun in learner code keep working
+    _graded_result['cell_profiles'] = []
+    _cell_start_time = None
+    _cell_sampler = None
+    
+    def _sample_cell_stacks(main_thread_id, stop_event, self_samples, total_samples):
+        if stop_event.wait(_profiling_threshold_in_seconds):
+            return
+        
+        while not stop_event.wait(_profiling_sampling_interval_in_seconds):
+            frame = sys._current_frames().get(main_thread_id)
+            seen = set()
+            
+            if frame is not None:
+                code = frame.f_code
+                self_samples[(code.co_filename, code.co_firstlineno, code.co_name)] += 1
+            
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_filename, code.co_firstlineno, code.co_name)
+                
+                if key not in seen:
+                    total_samples[key] += 1
+                    seen.add(key)
+                
+                frame = frame.f_back
+    
+    def _start_cell_profile(info):
+        global _cell_start_time, _cell_sampler
+        
+        stop_event = threading.Event()
+        self_samples = Counter()
+        total_samples = Counter()
+        sampler_thread = threading.Thread(
+            target=_sample_cell_stacks,
+            args=(threading.main_thread().ident, stop_event, self_samples, total_samples),
+            daemon=True
+        )
+        _cell_sampler = (sampler_thread, stop_event, self_samples, total_samples)
+        sampler_thread.start()
+        
+        _cell_start_time = time.perf_counter()
+    
+    def _stop_cell_profile(result):
+        global _cell_start_time, _cell_sampler
+        
+        if _cell_start_time is None:
+            return
+        
+        duration = time.perf_counter() - _cell_start_time
+        sampler_thread, stop_event, self_samples, total_samples = _cell_sampler
+        stop_event.set()
+        sampler_thread.join()
+        hotspots = []
+        
+        # only covers the part of the cell that ran after the threshold
+        for (filename, lineno, function_name), num_samples in self_samples.most_common(_profiling_num_hotspots):
+            hotspots.append({
+                'function': function_name,
+                'filename': filename,
+                'lineno': lineno,
+                'num_samples': num_samples,
+                'self_time_in_seconds': round(num_samples * _profiling_sampling_interval_in_seconds, 4),
+                'cumulative_time_in_seconds': round(
+                    total_samples[(filename, lineno, function_name)] * _profiling_sampling_interval_in_seconds, 4
+                ),
+            })
+        
+        _graded_result['cell_profiles'].append({
+            'execution_count': result.execution_count,
+            'duration_in_seconds': round(duration, 4),
+            'hotspots': hotspots,
+        })
+        
+        _cell_start_time = None
+        _cell_sampler = None
+    
+    get_ipython().events.register('pre_run_cell', _start_cell_profile)
+    get_ipython().events.register('post_run_cell', _stop_cell_profile)
+
 def _record_test_case(test_case_name, did_pass, available_points, message='', grade_manually=False):
     global _graded_result
     warning_message = ''
@@ -0,0 +1,465 @@
+import ast
+import re
+from IPython.core.inputtransformer2 import TransformerManager
+from .core import does_cell_contain_test_case
+
+# code cells tagged with skip_execution_tag are not sent to the kernel
+skip_execution_tag = 'lambdagrader-skip-execution'
+
+# calls that make the def/use analysis unreliable
+# the whole notebook is executed if any of these are found
+unsafe_function_names = {
+    'exec', 'eval', 'compile', 'globals', 'locals', 'vars',
+    'setattr', 'delattr', '__import__',
+}
+
+# line magics whose argument is code run in the kernel namespace (e.g., %time x = f())
+# the argument is analyzed like the rest of the cell
+# %timeit runs the code in a namespace of its own, so names bound by it don't persist
+code_magic_names = {'time', 'timeit', 'prun'}
+
+# line magics known not to read or bind names in the kernel namespace
+# the whole notebook is executed if any other line magic (e.g., %run other_notebook.ipynb) is found
+safe_magic_names = {
+    'matplotlib', 'config', 'load_ext', 'reload_ext', 'autoreload', 'pip', 'conda',
+    'precision', 'pprint', 'xmode', 'autosave', 'who', 'whos', 'pwd', 'cd', 'env', 'set_env',
+    'history', 'lsmagic', 'ls',
+}
+
+# IPython output history (_, __, _3, Out[3], ...)
+output_history_pattern = r'^(_{1,3}|_i{1,3}|_i?\d+|_oh|_ih|_dh|In|Out)$'
+
+# builtins known not to modify their arguments
+# a name passed to any other call, or any method called on a name,
+# is treated as a mutation of that name
+pure_builtin_names = {
+    'print', 'len', 'repr', 'str', 'int', 'float', 'bool', 'complex', 'abs', 'round',
+    'min', 'max', 'sum', 'sorted', 'list', 'tuple', 'set', 'frozenset', 'dict',
+    'range', 'enumerate', 'zip', 'isinstance', 'issubclass', 'type', 'id', 'hash',
+    'any', 'all', 'format', 'divmod', 'pow', 'hex', 'oct', 'bin', 'chr', 'ord',
+}
+
+# calls with effects outside of the kernel namespace (files, databases, RNG state, ...)
+# cells containing these are always executed
+side_effect_call_names = {
+    'open', 'to_csv', 'to_excel', 'to_json', 'to_parquet', 'to_sql', 'to_pickle',
+    'to_feather', 'to_hdf', 'savefig', 'write_image', 'write_html', 'write', 'writelines',
+    'dump', 'chdir', 'mkdir', 'makedirs', 'remove', 'unlink', 'rename', 'rmtree',
+    'connect', 'execute', 'executemany', 'executescript', 'commit', 'system',
+    'seed', 'set_seed', 'shuffle', 'urlretrieve', 'run_line_magic', 'getoutput',
+    # these draw from the global random number generator by default
+    'sample', 'choice', 'permutation', 'train_test_split',
+}
+
+# modules that keep global state between calls (e.g., the current pyplot figure)
+# calling any of their functions is treated as a mutation of the module
+stateful_module_names = {'matplotlib', 'matplotlib.pyplot', 'pylab', 'seaborn'}
+
+# names bound inside these are local to them and don't touch the kernel namespace
+local_scope_types = (
+    ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+    ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp,
+)
+
+_ipython_transformer = TransformerManager()
+
+
+
+def _get_base_name(node) -> str:
+    # df['a'].iloc[0] -> df
+    while isinstance(node, (ast.Attribute, ast.Subscript, ast.Starred)):
+        node = node.value
+
+    return node.id if isinstance(node, ast.Name) else None
+
+
+
+def _get_call_name(node) -> str:
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    elif isinstance(node.func, ast.Attribute):
+        return node.func.attr
+
+    return None
+
+
+
+def _collect_store_targets(target, names):
+    if isinstance(target, (ast.Tuple, ast.List)):
+        for elt in target.elts:
+            _collect_store_targets(elt, names)
+    elif isinstance(target, ast.Starred):
+        _collect_store_targets(target.value, names)
+    elif isinstance(target, ast.Name):
+        names.add(target.id)
+
+
+
+def _get_local_store_node_ids(tree) -> set:
+    # names assigned inside functions, lambdas, classes and comprehensions
+    # are local to those scopes and don't touch the kernel namespace
+    node_ids = set()
+
+    for scope in ast.walk(tree):
+        if isinstance(scope, local_scope_types):
+            for node in ast.walk(scope):
+                if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                    node_ids.add(id(node))
+                elif isinstance(node, ast.arg):
+                    node_ids.add(id(node))
+
+    return node_ids
+
+
+
+def _collect_mutated_names(tree) -> set:
+    # the type of a name is unknown, so a call can't be proven pure
+    # df['a'] = ..., obj.attr = ..., del df['a'], lst += [1], lst.append(...), heapq.heappush(h, 3)
+    mutated_names = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Attribute, ast.Subscript)) and not isinstance(node.ctx, ast.Load):
+            mutated_names.add(_get_base_name(node))
+        elif isinstance(node, ast.AugAssign):
+            # lst += [1] extends the list in place
+            mutated_names.add(_get_base_name(node.target))
+        elif isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Attribute):
+                mutated_names.add(_get_base_name(node.func.value))
+
+            if not (isinstance(node.func, ast.Name) and node.func.id in pure_builtin_names):
+                mutated_names.update(_get_base_name(arg) for arg in node.args)
+                mutated_names.update(_get_base_name(kw.value) for kw in node.keywords)
+
+    mutated_names.discard(None)
+
+    return mutated_names
+
+
+
+def _collect_state_setting_names(tree) -> set:
+    # a call whose result is thrown away only exists for its side effect
+    # pd.set_option(...), np.seterr(...) change global state even though pd and np are modules
+    state_setting_names = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            call = node.value
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr.startswith('set'):
+            call = node
+        else:
+            continue
+
+        if isinstance(call.func, ast.Attribute):
+            state_setting_names.add(_get_base_name(call.func.value))
+
+    state_setting_names.discard(None)
+
+    return state_setting_names
+
+
+
+def _collect_free_names(scope) -> set:
+    # names a function (or class, lambda, ...) reads from the enclosing namespace
+    # for a function these are looked up when it is called, not when it is defined
+    local_names = set()
+    loaded_names = set()
+    nested_free_names = set()
+    nodes = list(ast.iter_child_nodes(scope))
+
+    while nodes:
+        node = nodes.pop()
+
+        if isinstance(node, local_scope_types):
+            nested_free_names |= _collect_free_names(node)
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                local_names.add(node.name)
+            continue
+
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                loaded_names.add(node.id)
+            else:
+                local_names.add(node.id)
+        elif isinstance(node, ast.arg):
+            local_names.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            local_names.update(alias.asname or alias.name.split('.')[0] for alias in node.names)
+
+        nodes.extend(ast.iter_child_nodes(node))
+
+    # methods don't see the names bound in the class body
+    if isinstance(scope, ast.ClassDef):
+        return (loaded_names - local_names) | nested_free_names
+
+    return (loaded_names | nested_free_names) - local_names
+
+
+
+def _merge_magic_analysis(analysis, magic_analysis, binds_names):
+    for key in ('mutates', 'uses', 'calls', 'modules', 'stateful_modules', 'sets_state'):
+        analysis[key] |= magic_analysis[key]
+
+    for key in ('function_mutates', 'function_uses', 'function_sets_state'):
+        for name, names in magic_analysis[key].items():
+            analysis[key].setdefault(name, set()).update(names)
+
+    analysis['has_side_effects'] |= magic_analysis['has_side_effects']
+
+    if binds_names:
+        analysis['binds'] |= magic_analysis['binds']
+        analysis['rebinds'] |= magic_analysis['rebinds']
+        analysis['aliases'].update(magic_analysis['aliases'])
+
+
+
+def analyze_cell_dependencies(source: str) -> dict:
+    # returns the names a code cell binds, mutates, and uses
+    # None is returned if the analysis can't be sure
+    try:
+        tree = ast.parse(_ipython_transformer.transform_cell(source))
+    except SyntaxError:
+        return None
+
+    analysis = {
+        'binds': set(),
+        'mutates': _collect_mutated_names(tree),
+        'sets_state': _collect_state_setting_names(tree),
+        'rebinds': set(),
+        'uses': set(),
+        'calls': set(),
+        'function_mutates': {},
+        'function_uses': {},
+        'function_sets_state': {},
+        'aliases': {},
+        'modules': set(),
+        'stateful_modules': set(),
+        'has_side_effects': False,
+    }
+
+    # only top-level, unconditional assignments fully (re)bind a name
+    # anything else (inside if/for/try, augmented assignments, ...) is a mutation
+    for stmt in tree.body:
+        if isinstance(stmt, ast.Assign):
+            # b = a, s = df['a'], ... may share the object with the names on the right-hand side
+            source_names = set(
+                node.id for node in ast.walk(stmt.value)
+                if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+            )
+
+            for target in stmt.targets:
+                target_names = set()
+                _collect_store_targets(target, target_names)
+                analysis['binds'] |= target_names
+
+                for name in target_names:
+                    analysis['aliases'][name] = source_names - {name}
+
+                    # f = lambda: ... behaves like def f(): ...
+                    if isinstance(stmt.value, ast.Lambda):
+                        analysis['function_mutates'][name] = _collect_mutated_names(stmt.value)
+                        analysis['function_uses'][name] = _collect_free_names(stmt.value)
+                        analysis['function_sets_state'][name] = _collect_state_setting_names(stmt.value)
+        elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+            _collect_store_targets(stmt.target, analysis['binds'])
+        elif isinstance(stmt, (ast.Import, ast.ImportFrom)):
+            for alias in stmt.names:
+                if alias.name == '*':
+                    return None
+                bound_name = alias.asname or alias.name.split('.')[0]
+                analysis['binds'].add(bound_name)
+                analysis['modules'].add(bound_name)
+
+                module_name = f'{stmt.module}.{alias.name}' if isinstance(stmt, ast.ImportFrom) else alias.name
+                if module_name in stateful_module_names or (alias.asname is None and module_name.split('.')[0] in stateful_module_names):
+                    analysis['stateful_modules'].add(bound_name)
+        elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            analysis['binds'].add(stmt.name)
+
+    local_store_node_ids = _get_local_store_node_ids(tree)
+
+    # %time x = f() at the top level binds x, inside an if/for block it may not
+    top_level_call_ids = set(id(stmt.value) for stmt in tree.body if isinstance(stmt, ast.Expr))
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            return None
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            # calling the function (or method, or class) later mutates what its body mutates
+            # and reads the names its body reads from the kernel namespace at that point
+            analysis['function_mutates'].setdefault(node.name, set()).update(_collect_mutated_names(node))
+            analysis['function_uses'].setdefault(node.name, set()).update(_collect_free_names(node))
+            analysis['function_sets_state'].setdefault(node.name, set()).update(_collect_state_setting_names(node))
+        elif isinstance(node, ast.AugAssign) and _get_base_name(node.target):
+            # x += 1 reads x before assigning to it
+            analysis['uses'].add(_get_base_name(node.target))
+        elif isinstance(node, ast.Name):
+            if re.match(output_history_pattern, node.id):
+                return None
+            if isinstance(node.ctx, ast.Load):
+                analysis['uses'].add(node.id)
+            elif id(node) not in local_store_node_ids:
+                # conditional assignments, for loop targets, x += 1, ...
+                analysis['rebinds'].add(node.id)
+        elif isinstance(node, ast.Call):
+            call_name = _get_call_name(node)
+
+            if call_name in unsafe_function_names:
+                return None
+
+            if call_name == 'run_cell_magic':
+                return None
+
+            if call_name == 'run_line_magic':
+                magic_name = node.args[0].value if node.args and isinstance(node.args[0], ast.Constant) else None
+                magic_arg = node.args[1].value if len(node.args) > 1 and isinstance(node.args[1], ast.Constant) else None
+
+                if magic_name in code_magic_names:
+                    # options (e.g., %timeit -n 10 f()) are not parsed
+                    if not isinstance(magic_arg, str) or magic_arg.lstrip().startswith('-'):
+                        return None
+
+                    magic_analysis = analyze_cell_dependencies(magic_arg)
+
+                    if magic_analysis is None:
+                        return None
+
+                    _merge_magic_analysis(
+                        analysis,
+                        magic_analysis,
+                        binds_names=magic_name != 'timeit' and id(node) in top_level_call_ids
+                    )
+                elif magic_name not in safe_magic_names:
+                    return None
+
+            if call_name in side_effect_call_names:
+                analysis['has_side_effects'] = True
+
+            # RNG state is shared by every cell that draws random numbers
+            if 'random' in ast.dump(node.func):
+                analysis['has_side_effects'] = True
+
+            analysis['calls'].add(call_name)
+
+    return analysis
+
+
+
+def select_cells_to_execute(nb) -> list:
+    # returns indices of the code cells that test case cells (transitively) depend on
+    # None is returned if the whole notebook should be executed
+    test_case_indices = [
+        i for i, cell in enumerate(nb.cells)
+        if cell.cell_type == 'code' and does_cell_contain_test_case(cell)
+    ]
+
+    if not test_case_indices:
+        return None
+
+    # cells after the last test case cannot affect the graded result
+    last_test_case_index = test_case_indices[-1]
+    analyses = {}
+
+    for i, cell in enumerate(nb.cells[:last_test_case_index + 1]):
+        if cell.cell_type == 'code' and cell.source.strip():
+            analysis = analyze_cell_dependencies(cell.source)
+
+            if analysis is None:
+                return None
+
+            analyses[i] = analysis
+
+    function_mutates = {}
+    function_uses = {}
+    function_sets_state = {}
+    module_names = set()
+    stateful_modules = set()
+    for analysis in analyses.values():
+        for function_name, mutated_names in analysis['function_mutates'].items():
+            function_mutates.setdefault(function_name, set()).update(mutated_names)
+        for function_name, used_names in analysis['function_uses'].items():
+            function_uses.setdefault(function_name, set()).update(used_names)
+        for function_name, state_setting_names in analysis['function_sets_state'].items():
+            function_sets_state.setdefault(function_name, set()).update(state_setting_names)
+        module_names |= analysis['modules']
+        stateful_modules |= analysis['stateful_modules']
+
+    # pd.read_csv(...) doesn't change pd, but plt.plot(...) changes the current figure
+    stateless_modules = module_names - stateful_modules
+    alias_of = {}
+
+    for cell_index in sorted(analyses):
+        analysis = analyses[cell_index]
+
+        # a function (or method) defined in the notebook also mutates whatever its body mutates
+        # and uses whatever its body reads, including the functions it calls in turn
+        # a function passed around by name (e.g., df.apply(f)) counts as called
+        called_names = set()
+        to_visit = list((analysis['calls'] | analysis['uses']) & set(function_uses))
+
+        while to_visit:
+            function_name = to_visit.pop()
+
+            if function_name not in called_names:
+                called_names.add(function_name)
+                to_visit += list(function_uses[function_name] & set(function_uses))
+
+        for function_name in called_names:
+            analysis['mutates'] |= function_mutates.get(function_name, set())
+            analysis['uses'] |= function_uses[function_name]
+            analysis['sets_state'] |= function_sets_state.get(function_name, set())
+
+        # names bound in this cell take their aliases from the right-hand side
+        for name, source_names in analysis['aliases'].items():
+            alias_of[name] = source_names.union(*[alias_of.get(n, set()) for n in source_names])
+
+        # a mutation through one name is a mutation of every name sharing the object
+        mutated_names = set()
+        for name in analysis['mutates'] - stateless_modules:
+            shared_names = {name} | alias_of.get(name, set())
+            mutated_names |= shared_names
+            mutated_names |= set(n for n, sources in alias_of.items() if sources & shared_names)
+
+        # rebinding a name doesn't change the object it used to point to
+        analysis['mutates'] = (mutated_names - stateless_modules) | analysis['rebinds'] | analysis['sets_state']
+
+    required = set(test_case_indices) | set(
+        i for i, analysis in analyses.items() if analysis['has_side_effects']
+    )
+    to_visit = list(required)
+
+    while to_visit:
+        cell_index = to_visit.pop()
+
+        for name in analyses[cell_index]['uses']:
+            # walk back to the most recent cell that binds the name
+            # keeping every cell that mutates it along the way
+            for j in range(cell_index - 1, -1, -1):
+                if j not in analyses:
+                    continue
+
+                if name in analyses[j]['binds'] or name in analyses[j]['mutates']:
+                    if j not in required:
+                        required.add(j)
+                        to_visit.append(j)
+
+                    if name in analyses[j]['binds']:
+                        break
+
+    return sorted(required)
+
+
+
+def mark_cells_to_skip(nb, cell_indices_to_execute):
+    # tag every code cell that won't be executed and clear its stale outputs
+    cell_indices_to_execute = set(cell_indices_to_execute)
+
+    for i, cell in enumerate(nb.cells):
+        if cell.cell_type == 'code' and i not in cell_indices_to_execute:
+            tags = cell.metadata.setdefault('tags', [])
+            if skip_execution_tag not in tags:
+                tags.append(skip_execution_tag)
+            cell.outputs = []
+            cell.execution_count = None
+
+    return nb
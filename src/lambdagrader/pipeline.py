@@ -0,0 +1,109 @@
+import os
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from .grader import execute_notebook_for_grading, save_graded_outputs
+from .workspace import default_staging_methods, data_cache, submission_working_dir
+
+
+
+def _execute_submission(notebook_path, isolated, data_cache_dir, base_dir, methods, kwargs):
+    if isolated:
+        with submission_working_dir(base_dir=base_dir, methods=methods, data_cache_dir=data_cache_dir) as working_dir:
+            return execute_notebook_for_grading(notebook_path, working_dir=working_dir, **kwargs)
+
+    return execute_notebook_for_grading(notebook_path, **kwargs)
+
+
+
+def grade_notebooks_pipelined(
+    notebook_paths,
+    output_dir=None,
+    num_kernels=4,
+    num_renderers=None,
+    max_pending_renders=None,
+    isolated=True,
+    data_paths=None,
+    base_dir=None,
+    methods=default_staging_methods,
+    **kwargs
+) -> list:
+    # stage 1 (thread pool): load, hash, preprocess and execute in a kernel
+    # stage 2 (process pool): add_graded_result, extract user code, render HTML
+    # submission N+1 executes while submission N renders, so throughput
+    # is limited by the slowest stage rather than the sum of both
+    #
+    # returns graded results in the order of notebook_paths
+    # a submission that failed to grade has the raised exception in its place
+    #
+    # renderers are started with spawn, which re-imports the caller's __main__ module
+    # in every render process; scripts calling this must guard their top-level code
+    # with `if __name__ == '__main__':` or every renderer re-runs the whole batch
+    if not isolated and num_kernels > 1:
+        # every kernel would write lambdagrader-result.json to the same working directory
+        raise ValueError('isolated=False requires num_kernels=1, since kernels would share a result file')
+
+    notebook_paths = list(notebook_paths)
+    num_renderers = num_renderers or os.cpu_count() or 1
+    max_pending_renders = max_pending_renders or num_renderers * 2
+
+    results = [None] * len(notebook_paths)
+    render_futures = []
+    render_futures_lock = threading.Lock()
+
+    # bounds the number of executed notebooks held in memory while waiting to be rendered
+    slots = threading.BoundedSemaphore(num_kernels + max_pending_renders)
+
+    # kernel client threads are running in this process; spawn avoids forking them
+    mp_context = multiprocessing.get_context('spawn')
+
+    with ProcessPoolExecutor(max_workers=num_renderers, mp_context=mp_context) as render_pool:
+
+        def on_rendered(future, index):
+            if future.exception() is not None:
+                results[index] = future.exception()
+
+            slots.release()
+
+        def on_executed(future, index, notebook_path):
+            if future.exception() is not None:
+                results[index] = future.exception()
+                slots.release()
+                return
+
+            nb, graded_result = future.result()
+            results[index] = graded_result
+
+            try:
+                render_future = render_pool.submit(save_graded_outputs, nb, graded_result, notebook_path, output_dir)
+            except Exception as ex:
+                # e.g., a render process died and the pool is broken
+                results[index] = ex
+                slots.release()
+                return
+
+            render_future.add_done_callback(lambda f: on_rendered(f, index))
+
+            with render_futures_lock:
+                render_futures.append(render_future)
+
+        # the dataset is copied once into a read-only cache that every submission links to
+        use_data_cache = isolated and data_paths
+        with (data_cache(data_paths, base_dir=base_dir) if use_data_cache else contextlib.nullcontext()) as data_cache_dir:
+            # leaving this block joins the kernel threads, which also run the on_executed callbacks
+            # every render is submitted by the time it exits
+            with ThreadPoolExecutor(max_workers=num_kernels) as kernel_pool:
+                for index, notebook_path in enumerate(notebook_paths):
+                    slots.acquire()
+
+                    execute_future = kernel_pool.submit(
+                        _execute_submission, notebook_path, isolated, data_cache_dir, base_dir, methods, kwargs
+                    )
+                    execute_future.add_done_callback(
+                        lambda f, index=index, notebook_path=notebook_path: on_executed(f, index, notebook_path)
+                    )
+
+        wait(render_futures)
+
+    return results
@@ -0,0 +1,177 @@
+import ast
+import datetime
+from collections import Counter
+from IPython.core.inputtransformer2 import TransformerManager
+from .core import (
+    does_cell_contain_test_case,
+    extract_test_case_metadata_from_cell,
+    extract_test_cases_metadata_from_notebook,
+    extract_user_code_from_notebook,
+    get_test_cases_hash,
+    remove_comments
+)
+
+_ipython_transformer = TransformerManager()
+
+
+
+def find_syntax_errors(nb) -> list:
+    syntax_errors = []
+
+    for cell_index, cell in enumerate(nb.cells):
+        if cell.cell_type != 'code' or not cell.source.strip():
+            continue
+
+        # convert IPython magics (%timeit, !pip, ...) to plain Python before parsing
+        try:
+            source = _ipython_transformer.transform_cell(cell.source)
+            ast.parse(source)
+        except SyntaxError as ex:
+            syntax_errors.append({
+                'cell_index': cell_index,
+                'is_test_case': bool(does_cell_contain_test_case(cell)),
+                'test_case_name': (extract_test_case_metadata_from_cell(cell.source) or {}).get('test_case'),
+                'lineno': ex.lineno,
+                'message': f'SyntaxError: {ex.msg}',
+            })
+
+    return syntax_errors
+
+
+
+def compare_test_cases_with_manifest(nb, manifest) -> dict:
+    submitted = extract_test_cases_metadata_from_notebook(nb)
+
+    submitted_names = Counter(tc['test_case'] for tc in submitted)
+    expected_names = Counter(tc['test_case'] for tc in manifest)
+
+    # a test case is "modified" if its points or grading mode no longer match
+    expected_by_name = {tc['test_case']: tc for tc in manifest}
+    modified_test_cases = []
+
+    for tc in submitted:
+        expected = expected_by_name.get(tc['test_case'])
+
+        if expected and (tc['points'] != expected['points'] or tc['grade_manually'] != expected['grade_manually']):
+            modified_test_cases.append(tc['test_case'])
+
+    return {
+        'missing_test_cases': list((expected_names - submitted_names).elements()),
+        'unexpected_test_cases': list((submitted_names - expected_names).elements()),
+        'modified_test_cases': modified_test_cases,
+    }
+
+
+
+def _normalize_code(source: str) -> str:
+    # compare the structure of the code so that comments and formatting are ignored
+    # indentation is part of the structure in Python and still counts
+    try:
+        tree = ast.parse(_ipython_transformer.transform_cell(source))
+    except SyntaxError:
+        lines = remove_comments(source).splitlines()
+        return '\n'.join(line.rstrip() for line in lines if line.strip())
+
+    return '\n'.join(ast.dump(stmt) for stmt in tree.body)
+
+
+
+def is_empty_submission(nb) -> bool:
+    return _normalize_code(extract_user_code_from_notebook(nb)) == ''
+
+
+
+def is_unmodified_starter(nb, starter_nb) -> bool:
+    return _normalize_code(extract_user_code_from_notebook(nb)) == \
+        _normalize_code(extract_user_code_from_notebook(starter_nb))
+
+
+
+def run_preflight_checks(nb, manifest=None, expected_test_cases_hash=None, starter_nb=None) -> dict:
+    if starter_nb is not None:
+        if manifest is None:
+            manifest = extract_test_cases_metadata_from_notebook(starter_nb)
+        if expected_test_cases_hash is None:
+            expected_test_cases_hash = get_test_cases_hash(starter_nb)
+
+    syntax_errors = find_syntax_errors(nb)
+
+    # Black cannot format test case cells with syntax errors
+    try:
+        test_cases_hash = get_test_cases_hash(nb)
+    except ValueError:
+        test_cases_hash = None
+
+    preflight_result = {
+        'syntax_errors': syntax_errors,
+        'test_cases_hash': test_cases_hash,
+        'test_cases_hash_matches': None,
+        'missing_test_cases': [],
+        'unexpected_test_cases': [],
+        'modified_test_cases': [],
+        'is_empty_submission': is_empty_submission(nb),
+        'is_unmodified_starter': is_unmodified_starter(nb, starter_nb) if starter_nb is not None else None,
+        'has_test_cases': any(
+            cell.cell_type == 'code' and does_cell_contain_test_case(cell) for cell in nb.cells
+        ),
+    }
+
+    if expected_test_cases_hash is not None:
+        preflight_result['test_cases_hash_matches'] = test_cases_hash == expected_test_cases_hash
+
+    if manifest is not None:
+        preflight_result.update(compare_test_cases_with_manifest(nb, manifest))
+
+    return preflight_result
+
+
+
+def create_graded_result_from_manifest(manifest, message='') -> dict:
+    graded_result = {
+        'filename': None,
+        'learner_autograded_score': 0,
+        'max_autograded_score': 0,
+        'max_manually_graded_score': 0,
+        'max_total_score': 0,
+        'num_autograded_cases': 0,
+        'num_passed_cases': 0,
+        'num_failed_cases': 0,
+        'num_manually_graded_cases': 0,
+        'num_total_test_cases': 0,
+        'grading_finished_at': datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %I:%M %p %Z"),
+        'grading_duration_in_seconds': 0,
+        'results': [],
+    }
+
+    add_failed_test_cases_to_graded_result(graded_result, manifest, message)
+
+    return graded_result
+
+
+
+def add_failed_test_cases_to_graded_result(graded_result, test_cases, message='') -> dict:
+    # mirrors the totals computed in append-to-end-of-notebook.py
+    for tc in test_cases:
+        grade_manually = tc.get('grade_manually', False)
+
+        graded_result['results'].append({
+            'test_case_name': tc['test_case'],
+            'points': 0,
+            'available_points': tc['points'],
+            'pass': None if grade_manually else False,
+            'grade_manually': grade_manually,
+            'message': message,
+        })
+
+        graded_result['max_total_score'] += tc['points']
+        graded_result['num_total_test_cases'] += 1
+
+        if grade_manually:
+            graded_result['max_manually_graded_score'] += tc['points']
+            graded_result['num_manually_graded_cases'] += 1
+        else:
+            graded_result['max_autograded_score'] += tc['points']
+            graded_result['num_autograded_cases'] += 1
+            graded_result['num_failed_cases'] += 1
+
+    return graded_result
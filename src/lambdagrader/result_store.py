@@ -0,0 +1,313 @@
+import json
+import sqlite3
+import pandas as pd
+
+# graded result keys stored in their own columns
+# anything else (except 'results') is kept in the graded_result_json column
+submission_columns = [
+    'filename',
+    'learner_id',
+    'assignment_id',
+    'submission_notebook_hash',
+    'test_cases_hash',
+    'learner_autograded_score',
+    'max_autograded_score',
+    'max_manually_graded_score',
+    'max_total_score',
+    'num_autograded_cases',
+    'num_passed_cases',
+    'num_failed_cases',
+    'num_manually_graded_cases',
+    'num_total_test_cases',
+    'grading_finished_at',
+    'grading_duration_in_seconds',
+]
+
+result_store_schema = '''
+CREATE TABLE IF NOT EXISTS submissions (
+    submission_id INTEGER PRIMARY KEY,
+    filename TEXT,
+    learner_id TEXT,
+    assignment_id TEXT,
+    submission_notebook_hash TEXT,
+    test_cases_hash TEXT,
+    learner_autograded_score REAL,
+    max_autograded_score REAL,
+    max_manually_graded_score REAL,
+    max_total_score REAL,
+    num_autograded_cases INTEGER,
+    num_passed_cases INTEGER,
+    num_failed_cases INTEGER,
+    num_manually_graded_cases INTEGER,
+    num_total_test_cases INTEGER,
+    grading_finished_at TEXT,
+    grading_duration_in_seconds REAL,
+    graded_result_json TEXT
+);
+
+CREATE TABLE IF NOT EXISTS test_case_results (
+    submission_id INTEGER NOT NULL REFERENCES submissions(submission_id) ON DELETE CASCADE,
+    test_case_name TEXT,
+    points REAL,
+    available_points REAL,
+    pass INTEGER,
+    grade_manually INTEGER,
+    message TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_submissions_learner ON submissions(learner_id, assignment_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_assignment ON submissions(assignment_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_notebook_hash ON submissions(submission_notebook_hash);
+CREATE INDEX IF NOT EXISTS idx_submissions_test_cases_hash ON submissions(test_cases_hash);
+CREATE INDEX IF NOT EXISTS idx_results_submission ON test_case_results(submission_id);
+CREATE INDEX IF NOT EXISTS idx_results_test_case ON test_case_results(test_case_name, pass);
+'''
+
+# gradebook columns holding the points of each test case are named points:<test case name>
+# so that a test case named e.g. "filename" doesn't collide with the submission columns
+gradebook_test_case_column_prefix = 'points:'
+
+
+
+def open_result_store(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+
+    # WAL lets readers query the store while a grading batch is writing to it
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.executescript(result_store_schema)
+
+    return conn
+
+
+
+def insert_graded_results(conn, graded_results, assignment_id=None, learner_id=None, batch_size=500) -> list:
+    # learner_id can be a dict mapping submission filenames to learner IDs,
+    # a callable that returns the learner ID of a graded result, or the learner ID itself
+    # graded results keep their own 'learner_id' (if any) when learner_id is None
+    submission_ids = []
+    batch = []
+
+    for graded_result in graded_results:
+        batch.append(graded_result)
+
+        if len(batch) >= batch_size:
+            submission_ids += _insert_graded_results_batch(conn, batch, assignment_id, learner_id)
+            batch = []
+
+    if batch:
+        submission_ids += _insert_graded_results_batch(conn, batch, assignment_id, learner_id)
+
+    return submission_ids
+
+
+
+def insert_graded_result(conn, graded_result, assignment_id=None, learner_id=None) -> int:
+    return insert_graded_results(conn, [graded_result], assignment_id=assignment_id, learner_id=learner_id)[0]
+
+
+
+def _get_learner_id(graded_result, learner_id):
+    if learner_id is None:
+        return graded_result.get('learner_id')
+    elif isinstance(learner_id, str):
+        return learner_id
+    elif callable(learner_id):
+        return learner_id(graded_result)
+
+    return learner_id.get(graded_result.get('filename'), graded_result.get('learner_id'))
+
+
+
+def _insert_graded_results_batch(conn, batch, assignment_id, learner_id) -> list:
+    submission_ids = []
+    result_rows = []
+    insert_submission_query = f'''
+INSERT INTO submissions ({', '.join(submission_columns)}, graded_result_json)
+VALUES ({', '.join(['?'] * (len(submission_columns) + 1))})
+'''
+
+    # a single transaction per batch
+    # committing each submission separately is orders of magnitude slower
+    with conn:
+        for graded_result in batch:
+            gr = dict(graded_result)
+
+            if assignment_id is not None:
+                gr['assignment_id'] = assignment_id
+
+            gr['learner_id'] = _get_learner_id(graded_result, learner_id)
+
+            results = gr.pop('results', [])
+            extra = {k: v for k, v in gr.items() if k not in submission_columns}
+
+            cursor = conn.execute(
+                insert_submission_query,
+                [gr.get(k) for k in submission_columns] + [json.dumps(extra)]
+            )
+            submission_id = cursor.lastrowid
+            submission_ids.append(submission_id)
+
+            for o in results:
+                result_rows.append((
+                    submission_id,
+                    o['test_case_name'],
+                    o['points'],
+                    o['available_points'],
+                    o['pass'],
+                    o.get('grade_manually', False),
+                    o.get('message', ''),
+                ))
+
+        conn.executemany(
+            'INSERT INTO test_case_results VALUES (?, ?, ?, ?, ?, ?, ?)',
+            result_rows
+        )
+
+    return submission_ids
+
+
+
+def _build_where_clause(conditions) -> tuple:
+    clauses = []
+    params = []
+
+    for column, value in conditions:
+        if value is not None:
+            clauses.append(f'{column} = ?')
+            params.append(value)
+
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+
+def get_graded_result(conn, submission_id) -> dict:
+    row = conn.execute(
+        'SELECT * FROM submissions WHERE submission_id = ?',
+        (submission_id,)
+    ).fetchone()
+
+    if row is None:
+        return None
+
+    graded_result = dict(row)
+    graded_result.update(json.loads(graded_result.pop('graded_result_json') or '{}'))
+
+    result_rows = conn.execute(
+        '''
+SELECT test_case_name, points, available_points, pass, grade_manually, message
+FROM test_case_results WHERE submission_id = ? ORDER BY rowid
+''',
+        (submission_id,)
+    ).fetchall()
+
+    graded_result['results'] = []
+    for r in result_rows:
+        o = dict(r)
+        o['pass'] = None if o['pass'] is None else bool(o['pass'])
+        o['grade_manually'] = bool(o['grade_manually'])
+        graded_result['results'].append(o)
+
+    return graded_result
+
+
+
+def find_submissions(conn, learner_id=None, assignment_id=None, submission_notebook_hash=None, test_cases_hash=None) -> list:
+    where_clause, params = _build_where_clause([
+        ('learner_id', learner_id),
+        ('assignment_id', assignment_id),
+        ('submission_notebook_hash', submission_notebook_hash),
+        ('test_cases_hash', test_cases_hash),
+    ])
+
+    rows = conn.execute(
+        f'SELECT * FROM submissions{where_clause} ORDER BY submission_id',
+        params
+    ).fetchall()
+
+    return [dict(r) for r in rows]
+
+
+
+def find_submissions_by_test_case(conn, test_case_name, did_pass=False, assignment_id=None) -> list:
+    # did_pass=None finds test cases waiting to be graded manually
+    # did_pass='any' finds every result of the test case
+    where_clause, params = _build_where_clause([
+        ('r.test_case_name', test_case_name),
+        ('r.pass', None if did_pass in (None, 'any') else did_pass),
+        ('s.assignment_id', assignment_id),
+    ])
+
+    if did_pass is None:
+        where_clause += (' AND ' if where_clause else ' WHERE ') + 'r.pass IS NULL'
+
+    rows = conn.execute(
+        f'''
+SELECT s.submission_id, s.filename, s.learner_id, s.assignment_id,
+       r.test_case_name, r.points, r.available_points, r.pass, r.message
+FROM test_case_results r
+JOIN submissions s ON s.submission_id = r.submission_id{where_clause}
+ORDER BY s.submission_id
+''',
+        params
+    ).fetchall()
+
+    return [dict(r) for r in rows]
+
+
+
+def export_gradebook(conn, assignment_id=None, latest_only=True) -> pd.DataFrame:
+    where_clause, params = _build_where_clause([
+        ('assignment_id', assignment_id),
+    ])
+
+    # a learner may be graded more than once
+    # keep the most recent submission per learner and assignment
+    if latest_only:
+        latest_filter = '''
+submission_id IN (
+    SELECT MAX(submission_id) FROM submissions
+    GROUP BY COALESCE(learner_id, filename), assignment_id
+)'''
+        where_clause = f'{where_clause} AND {latest_filter}' if where_clause else f' WHERE {latest_filter}'
+
+    df_submissions = pd.read_sql_query(
+        f'''
+SELECT submission_id, learner_id, assignment_id, filename,
+       learner_autograded_score, max_autograded_score,
+       num_passed_cases, num_autograded_cases, num_manually_graded_cases,
+       max_total_score, submission_notebook_hash, test_cases_hash
+FROM submissions{where_clause}
+ORDER BY submission_id
+''',
+        conn,
+        params=params
+    )
+
+    df_results = pd.read_sql_query(
+        f'''
+SELECT r.submission_id, r.test_case_name, r.points
+FROM test_case_results r
+WHERE r.submission_id IN (SELECT submission_id FROM submissions{where_clause})
+''',
+        conn,
+        params=params
+    )
+
+    if df_results.empty:
+        return df_submissions
+
+    # one column per test case with the learner's points
+    df_points = df_results.pivot_table(
+        index='submission_id',
+        columns='test_case_name',
+        values='points',
+        aggfunc='sum'
+    )
+
+    df_points = df_points.add_prefix(gradebook_test_case_column_prefix)
+    df_points.columns.name = None
+
+    return df_submissions.merge(df_points, how='left', left_on='submission_id', right_index=True)
@@ -0,0 +1,234 @@
+import os
+import stat
+import shutil
+import logging
+import tempfile
+import threading
+import contextlib
+
+# fcntl is not available on Windows, where reflinks are skipped
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Linux ioctl to clone a file's extents (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+default_staging_methods = ('reflink', 'hardlink', 'copy')
+
+# the data cache is never linked to the original dataset
+data_cache_staging_methods = ('reflink', 'copy')
+
+logger = logging.getLogger(__name__)
+
+# data cache file -> (original data file, its state when it was cached)
+_data_cache_files = {}
+_data_cache_lock = threading.Lock()
+
+# data paths that already logged falling back to copying
+_copy_fallback_logged = set()
+
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        raise OSError('Reflinks are not supported on this platform')
+
+    try:
+        with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+    except OSError:
+        # the file system does not support reflinks
+        if os.path.exists(dst):
+            os.remove(dst)
+        raise
+
+
+
+def _is_write_protected(path) -> bool:
+    # hardlinks and symlinks share the original file with learner code
+    # they are only safe if the grader process itself can't write to the original
+    # root bypasses file permissions, so nothing is write-protected for it
+    is_root = hasattr(os, 'geteuid') and os.geteuid() == 0
+    return not is_root and not os.access(path, os.W_OK)
+
+
+
+def stage_data_file(src, dst, methods=default_staging_methods, link_source=False) -> str:
+    # try each staging method in order and return the one that worked
+    # source files are never modified
+    # link_source=True allows hardlinks and symlinks to a source the caller made read-only (e.g., the data cache)
+    for method in methods:
+        try:
+            if method == 'reflink':
+                _reflink(src, dst)
+            elif method == 'hardlink':
+                if not (link_source or _is_write_protected(src)):
+                    continue
+                os.link(src, dst)
+            elif method == 'symlink':
+                if not (link_source or _is_write_protected(src)):
+                    continue
+                os.symlink(os.path.realpath(src), dst)
+            elif method == 'copy':
+                shutil.copy2(src, dst)
+            else:
+                raise ValueError(f'Unknown staging method "{method}"')
+
+            return method
+        except OSError:
+            continue
+
+    raise OSError(f'Could not stage {src} using any of {", ".join(methods)}')
+
+
+
+def stage_data_files(data_paths, working_dir, methods=default_staging_methods, link_source=False) -> dict:
+    staged_files = {}
+
+    for data_path in data_paths:
+        data_path = os.path.realpath(data_path)
+
+        if os.path.isdir(data_path):
+            # keep the directory name so that relative paths like data/sales.csv still work
+            dir_name = os.path.basename(data_path)
+
+            for root, _, filenames in os.walk(data_path):
+                dst_dir = os.path.join(working_dir, dir_name, os.path.relpath(root, data_path))
+                os.makedirs(dst_dir, exist_ok=True)
+
+                for filename in filenames:
+                    dst = os.path.join(dst_dir, filename)
+                    staged_files[os.path.relpath(dst, working_dir)] = stage_data_file(
+                        os.path.join(root, filename), dst, methods, link_source
+                    )
+        else:
+            dst = os.path.join(working_dir, os.path.basename(data_path))
+            staged_files[os.path.basename(data_path)] = stage_data_file(data_path, dst, methods, link_source)
+
+        # logged once per data path rather than once per file and submission
+        if methods[0] != 'copy' and 'copy' in staged_files.values() and data_path not in _copy_fallback_logged:
+            _copy_fallback_logged.add(data_path)
+            logger.warning('Could not stage %s using %s, copying it instead', data_path, ', '.join(methods[:-1]))
+
+    return staged_files
+
+
+
+def _make_scratch_dir(prefix, data_paths=None, base_dir=None) -> str:
+    if base_dir is None and data_paths:
+        # hardlinks and reflinks only work within a single file system
+        # so scratch directories go next to the data by default
+        try:
+            return tempfile.mkdtemp(prefix=prefix, dir=os.path.dirname(os.path.realpath(data_paths[0])))
+        except OSError:
+            logger.warning('Could not create a scratch directory next to %s, using the system temp directory', data_paths[0])
+
+    return tempfile.mkdtemp(prefix=prefix, dir=base_dir)
+
+
+
+def _get_file_state(path) -> tuple:
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns, st.st_mode
+
+
+
+def _walk_files(src_path, dst_path):
+    if not os.path.isdir(src_path):
+        yield src_path, dst_path
+        return
+
+    for root, _, filenames in os.walk(src_path):
+        for filename in filenames:
+            src = os.path.join(root, filename)
+            yield src, os.path.join(dst_path, os.path.relpath(src, src_path))
+
+
+
+@contextlib.contextmanager
+def data_cache(data_paths, base_dir=None, cleanup=True):
+    # a read-only copy of the dataset shared by every submission in a batch
+    # the dataset is copied (or reflinked) once, and each submission hardlinks to the copy
+    # this keeps the original dataset untouched whoever the grader runs as
+    data_cache_dir = _make_scratch_dir('lambdagrader-data-', data_paths, base_dir)
+
+    try:
+        stage_data_files(data_paths, data_cache_dir, data_cache_staging_methods)
+
+        for data_path in data_paths:
+            data_path = os.path.realpath(data_path)
+            cached_path = os.path.join(data_cache_dir, os.path.basename(data_path))
+
+            for src, dst in _walk_files(data_path, cached_path):
+                os.chmod(dst, os.stat(dst).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+                _data_cache_files[dst] = (src, _get_file_state(dst))
+
+        yield data_cache_dir
+    finally:
+        for dst in [k for k in _data_cache_files if k.startswith(data_cache_dir + os.sep)]:
+            del _data_cache_files[dst]
+
+        if cleanup:
+            shutil.rmtree(data_cache_dir, ignore_errors=True)
+
+
+
+def _repair_data_cache(data_cache_dir):
+    # file permissions don't stop learner code running as root (or as the owner of the cache, who can chmod it)
+    # from writing through a hardlink, so cached files are checked after every submission
+    # submissions graded concurrently must not restore the same file at once
+    with _data_cache_lock:
+        for dst, (src, file_state) in list(_data_cache_files.items()):
+            if not dst.startswith(data_cache_dir + os.sep):
+                continue
+
+            try:
+                is_modified = _get_file_state(dst) != file_state
+            except OSError:
+                is_modified = True
+
+            if is_modified:
+                logger.warning('%s was modified by a submission, restoring it from %s', dst, src)
+
+                # a new inode, so submissions still linked to the modified file don't change again
+                tmp_path = dst + '.lambdagrader-tmp'
+                shutil.copy2(src, tmp_path)
+                os.chmod(tmp_path, os.stat(tmp_path).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+                os.replace(tmp_path, dst)
+
+                _data_cache_files[dst] = (src, _get_file_state(dst))
+
+
+
+@contextlib.contextmanager
+def submission_working_dir(
+    data_paths=None,
+    base_dir=None,
+    methods=default_staging_methods,
+    cleanup=True,
+    data_cache_dir=None
+):
+    # an isolated scratch directory for a single submission
+    # the kernel runs in this directory, so the result JSON and any files written by learner code stay in it
+    # with a data_cache_dir (see data_cache), the cached dataset is linked instead of data_paths
+    if data_cache_dir is not None:
+        working_dir = _make_scratch_dir('lambdagrader-', base_dir=base_dir or os.path.dirname(data_cache_dir))
+    else:
+        working_dir = _make_scratch_dir('lambdagrader-', data_paths, base_dir)
+
+    try:
+        if data_cache_dir is not None:
+            cached_paths = [os.path.join(data_cache_dir, name) for name in sorted(os.listdir(data_cache_dir))]
+            stage_data_files(cached_paths, working_dir, methods, link_source=True)
+        elif data_paths:
+            stage_data_files(data_paths, working_dir, methods)
+
+        yield working_dir
+    finally:
+        if cleanup:
+            shutil.rmtree(working_dir, ignore_errors=True)
+
+        if data_cache_dir is not None:
+            _repair_data_cache(data_cache_dir)
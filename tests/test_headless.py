@@ -0,0 +1,59 @@
+import lambdagrader
+import nbformat
+from nbformat.v4 import new_notebook, new_code_cell
+
+
+def get_output_mimetypes(cell):
+    return set(k for o in cell.outputs for k in o.get('data', {}).keys())
+
+
+def make_notebook():
+    return new_notebook(cells=[
+        new_code_cell('import matplotlib.pyplot as plt\nplt.plot([1, 2, 3])\nplt.show()'),
+        new_code_cell("import plotly.express as px\nfig = px.line(x=[1, 2], y=[3, 4], title='Line')\nfig.show()\nfig"),
+        new_code_cell("_test_case = 'tc-01'\n_points = 5\n\nassert fig.layout.title.text == 'Line'"),
+        # figures are closed at the end of each cell in both modes
+        new_code_cell("_test_case = 'tc-02'\n_points = 5\n\nassert len(plt.gca().lines) == 1"),
+        new_code_cell("_test_case = 'tc-03'\n_points = 5\n\nplt.plot([1, 2])\nassert len(plt.gca().lines) == 1"),
+        new_code_cell('_enable_rendering()\nfig'),
+    ])
+
+
+def test_headless_mode_skips_figure_rendering(tmp_path):
+    notebook_path = tmp_path / 'headless.ipynb'
+    nbformat.write(make_notebook(), str(notebook_path))
+
+    nb, graded_result = lambdagrader.execute_notebook_for_grading(str(notebook_path), headless=True)
+
+    # the first cell is added by add_grader_scripts
+    assert 'image/png' not in get_output_mimetypes(nb.cells[1])
+    assert not any(o['output_type'] == 'stream' and o['name'] == 'stderr' for o in nb.cells[1].outputs)
+    assert 'application/vnd.plotly.v1+json' not in get_output_mimetypes(nb.cells[2])
+    assert 'application/vnd.plotly.v1+json' in get_output_mimetypes(nb.cells[6])
+
+
+def test_headless_mode_survives_matplotlib_inline_magic(tmp_path):
+    nb = new_notebook(cells=[
+        new_code_cell('%matplotlib inline\nimport matplotlib.pyplot as plt'),
+        new_code_cell('plt.plot([1, 2, 3])\nplt.show()'),
+        new_code_cell('_enable_rendering()\n%matplotlib inline\nplt.plot([1, 2, 3])\nplt.show()'),
+    ])
+    notebook_path = tmp_path / 'headless-inline.ipynb'
+    nbformat.write(nb, str(notebook_path))
+
+    nb, _ = lambdagrader.execute_notebook_for_grading(str(notebook_path), headless=True)
+
+    # the first cell is added by add_grader_scripts
+    assert 'image/png' not in get_output_mimetypes(nb.cells[2])
+    assert 'image/png' in get_output_mimetypes(nb.cells[3])
+
+
+def test_headless_mode_does_not_change_grades(tmp_path):
+    notebook_path = tmp_path / 'headless.ipynb'
+    nbformat.write(make_notebook(), str(notebook_path))
+
+    _, graded_result = lambdagrader.execute_notebook_for_grading(str(notebook_path))
+    _, headless_graded_result = lambdagrader.execute_notebook_for_grading(str(notebook_path), headless=True)
+
+    assert [o['pass'] for o in graded_result['results']] == [True, False, True]
+    assert [o['pass'] for o in headless_graded_result['results']] == [True, False, True]
@@ -0,0 +1,34 @@
+import lambdagrader
+import nbformat
+import os
+import hashlib
+
+TEST_NOTEBOOKS_DIR = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    'test-notebooks',
+)
+
+notebook_path = os.path.join(TEST_NOTEBOOKS_DIR, 'test-file-graded.ipynb')
+
+
+def test_load_notebook_for_grading_strips_outputs():
+    nb, submission_notebook_hash = lambdagrader.load_notebook_for_grading(
+        notebook_path,
+        strip_outputs=True,
+        strip_attachments=True,
+        validate=False
+    )
+    nb_expected = nbformat.read(notebook_path, as_version=4)
+
+    with open(notebook_path, 'rb') as f:
+        assert submission_notebook_hash == hashlib.md5(f.read()).hexdigest()
+
+    assert [c.source for c in nb.cells] == [c.source for c in nb_expected.cells]
+    assert any(c.get('outputs') for c in nb_expected.cells)
+    assert not any(c.get('outputs') for c in nb.cells)
+
+
+def test_load_notebook_for_grading_matches_nbformat_read():
+    nb, _ = lambdagrader.load_notebook_for_grading(notebook_path)
+
+    assert nb == nbformat.read(notebook_path, as_version=4)
@@ -0,0 +1,152 @@
+import lambdagrader
+import nbformat
+from nbformat.v4 import new_notebook, new_code_cell, new_markdown_cell
+
+
+def make_notebook(*sources):
+    return new_notebook(cells=[new_markdown_cell('# Exercise')] + [new_code_cell(s) for s in sources])
+
+
+def test_select_cells_to_execute_skips_unrelated_cells():
+    nb = make_notebook(
+        'import matplotlib.pyplot as plt\nnums = [3, 1, 2]',      # 1
+        "plt.title('Numbers')\nplt.show()",                           # 2
+        'print(nums)',                                              # 3
+        'nums.sort()',                                              # 4
+        'total = sum(nums)',                                        # 5
+        "_test_case = 'tc-01'\n_points = 5\n\nassert nums == [1, 2, 3]",  # 6
+        'print(total)',                                             # 7
+    )
+
+    assert lambdagrader.select_cells_to_execute(nb) == [1, 4, 6]
+
+
+def test_select_cells_to_execute_treats_unknown_calls_as_mutations():
+    test_case_source = "_test_case = 'tc-01'\n_points = 5\n\nassert {}"
+
+    cases = [
+        (['import heapq\nh = []', 'heapq.heappush(h, 3)'], 'h == [3]'),
+        (['from collections import deque\nd = deque([1])', 'd.appendleft(0)'], 'list(d) == [0, 1]'),
+        (['import numpy as np\narr = np.zeros(3)', 'arr.fill(1)'], 'arr.sum() == 3'),
+        (['import pandas as pd\ndf = pd.DataFrame({"a": [1, 2]})', "s = df['a']\ns.iloc[0] = 5"], "df['a'][0] == 5"),
+    ]
+
+    for sources, assertion in cases:
+        nb = make_notebook(*sources, test_case_source.format(assertion))
+        assert lambdagrader.select_cells_to_execute(nb) == [1, 2, 3]
+
+
+def test_select_cells_to_execute_follows_aliases():
+    nb = make_notebook(
+        'a = [1]',
+        'b = a',
+        'b.append(2)',
+        "_test_case = 'tc-01'\n_points = 5\n\nassert a == [1, 2]",
+    )
+
+    assert lambdagrader.select_cells_to_execute(nb) == [1, 2, 3, 4]
+
+    nb.cells[3].source = 'b += [2]'
+    assert lambdagrader.select_cells_to_execute(nb) == [1, 2, 3, 4]
+
+
+def test_select_cells_to_execute_keeps_stateful_module_calls():
+    nb = make_notebook(
+        'import matplotlib.pyplot as plt',
+        "plt.title('Sales')",
+        "_test_case = 'tc-01'\n_points = 5\n\nassert plt.gca().get_title() == 'Sales'",
+    )
+
+    assert lambdagrader.select_cells_to_execute(nb) == [1, 2, 3]
+
+
+def test_select_cells_to_execute_resolves_function_globals_at_call_site():
+    nb = make_notebook(
+        'def total():\n    return sum(nums)',
+        'nums = [1, 2]',
+        'print(total)',
+        "_test_case = 'tc-01'\n_points = 5\n\nassert total() == 3",
+    )
+
+    assert lambdagrader.select_cells_to_execute(nb) == [1, 2, 4]
+
+    # functions calling other functions, lambdas and methods
+    nb.cells[1].source = 'def helper():\n    return sum(nums)\n\ntotal = lambda: helper()'
+    assert lambdagrader.select_cells_to_execute(nb) == [1, 2, 4]
+
+    nb.cells[1].source = 'class Summer:\n    def total(self):\n        return sum(nums)'
+    nb.cells[4].source = "_test_case = 'tc-01'\n_points = 5\n\nassert Summer().total() == 3"
+    assert lambdagrader.select_cells_to_execute(nb) == [1, 2, 4]
+
+
+def test_select_cells_to_execute_analyzes_code_magics():
+    nb = make_notebook(
+        'def f():\n    return 3',
+        '%time x = f()',
+        "_test_case = 'tc-01'\n_points = 5\n\nassert x == 3",
+    )
+
+    assert lambdagrader.select_cells_to_execute(nb) == [1, 2, 3]
+
+    nb.cells[2].source = '%timeit -n 1 x = f()'
+    assert lambdagrader.select_cells_to_execute(nb) is None
+
+    nb.cells[2].source = '%pinfo f'
+    assert lambdagrader.select_cells_to_execute(nb) is None
+
+
+def test_select_cells_to_execute_keeps_module_setters():
+    nb = make_notebook(
+        'import pandas as pd',
+        "pd.set_option('display.max_rows', 5)",
+        'def configure():\n    pd.set_option("display.max_columns", 5)',
+        'configure()',
+        "df = pd.DataFrame({'a': [1]})",
+        "_test_case = 'tc-01'\n_points = 5\n\nassert pd.get_option('display.max_rows') == 5",
+    )
+
+    assert lambdagrader.select_cells_to_execute(nb) == [1, 2, 3, 4, 6]
+
+
+def test_select_cells_to_execute_falls_back_when_unsure():
+    nb = make_notebook(
+        "exec('x = 1')",
+        "_test_case = 'tc-01'\n_points = 5\n\nassert x == 1",
+    )
+
+    assert lambdagrader.select_cells_to_execute(nb) is None
+
+
+def test_grade_notebook_with_partial_execution(tmp_path):
+    nb = make_notebook(
+        'x = 2',
+        "print('exploration')",
+        "_test_case = 'tc-01'\n_points = 5\n\nassert x == 2",
+        "raise ValueError('never executed')",
+    )
+    notebook_path = tmp_path / 'partial.ipynb'
+    nbformat.write(nb, str(notebook_path))
+
+    nb, graded_result = lambdagrader.execute_notebook_for_grading(str(notebook_path), partial_execution=True)
+
+    # the first cell is added by add_grader_scripts
+    assert nb.cells[3].execution_count is None
+    assert nb.cells[5].execution_count is None
+    assert nb.cells[5].outputs == []
+    assert graded_result['num_passed_cases'] == 1
+
+
+def test_grade_notebook_with_partial_execution_matches_full_execution(tmp_path):
+    nb = make_notebook(
+        'def total():\n    return sum(nums)',
+        'nums = [1, 2]',
+        'def f():\n    return 3',
+        '%time x = f()',
+        "_test_case = 'tc-01'\n_points = 5\n\nassert total() == 3 and x == 3",
+    )
+    notebook_path = tmp_path / 'partial-globals.ipynb'
+    nbformat.write(nb, str(notebook_path))
+
+    for partial_execution in (False, True):
+        _, graded_result = lambdagrader.execute_notebook_for_grading(str(notebook_path), partial_execution=partial_execution)
+        assert graded_result['num_passed_cases'] == 1
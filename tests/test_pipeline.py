@@ -0,0 +1,33 @@
+import lambdagrader
+import pytest
+import nbformat
+from nbformat.v4 import new_notebook, new_code_cell
+
+
+def test_grade_notebooks_pipelined(tmp_path):
+    notebook_paths = []
+
+    for i in range(3):
+        nb = new_notebook(cells=[
+            new_code_cell(f'x = {i}'),
+            new_code_cell("_test_case = 'tc-01'\n_points = 5\n\nassert x == 1"),
+        ])
+        notebook_path = str(tmp_path / f'submission-{i}.ipynb')
+        nbformat.write(nb, notebook_path)
+        notebook_paths.append(notebook_path)
+
+    notebook_paths.append(str(tmp_path / 'missing.ipynb'))
+
+    results = lambdagrader.grade_notebooks_pipelined(notebook_paths, num_kernels=2, num_renderers=1)
+
+    assert [gr['num_passed_cases'] for gr in results[:3]] == [0, 1, 0]
+    assert isinstance(results[3], FileNotFoundError)
+
+    for i in range(3):
+        assert (tmp_path / f'submission-{i}-graded.html').exists()
+        assert (tmp_path / f'submission-{i}-result.json').exists()
+
+
+def test_grade_notebooks_pipelined_rejects_shared_working_dir(tmp_path):
+    with pytest.raises(ValueError):
+        lambdagrader.grade_notebooks_pipelined([str(tmp_path / 'a.ipynb')], num_kernels=2, isolated=False)
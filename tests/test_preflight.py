@@ -0,0 +1,130 @@
+import lambdagrader
+import nbformat
+from nbformat.v4 import new_notebook, new_code_cell, new_markdown_cell
+
+
+def make_notebook(user_code, test_case_source="_test_case = 'tc-01'\n_points = 5\n\nassert c == 3"):
+    cells = [
+        new_markdown_cell('## Question 1'),
+        new_code_cell(user_code),
+    ]
+
+    if test_case_source is not None:
+        cells.append(new_code_cell(test_case_source))
+
+    return new_notebook(cells=cells)
+
+
+starter_nb = make_notebook('a = 1\nb = 2\n\n# YOUR CODE BEGINS\n\n# YOUR CODE ENDS')
+
+
+def test_find_syntax_errors():
+    nb = make_notebook('%matplotlib inline\nc = (1 +')
+    syntax_errors = lambdagrader.find_syntax_errors(nb)
+
+    assert len(syntax_errors) == 1
+    assert syntax_errors[0]['cell_index'] == 1
+    assert not syntax_errors[0]['is_test_case']
+
+
+def test_preflight_flags_unmodified_starter_and_missing_test_cases():
+    preflight_result = lambdagrader.run_preflight_checks(
+        make_notebook('a = 1\nb = 2  # unchanged\n\n# YOUR CODE BEGINS\n# YOUR CODE ENDS'),
+        starter_nb=starter_nb
+    )
+    assert preflight_result['is_unmodified_starter']
+    assert preflight_result['test_cases_hash_matches']
+    assert not preflight_result['is_empty_submission']
+
+    preflight_result = lambdagrader.run_preflight_checks(
+        make_notebook('c = 3', test_case_source=None),
+        starter_nb=starter_nb
+    )
+    assert not preflight_result['has_test_cases']
+    assert preflight_result['missing_test_cases'] == ['tc-01']
+
+
+def test_grade_notebook_without_test_cases_skips_execution(tmp_path):
+    notebook_path = tmp_path / 'no-test-cases.ipynb'
+    nbformat.write(make_notebook('c = 3', test_case_source=None), str(notebook_path))
+
+    graded_result = lambdagrader.grade_notebook(
+        str(notebook_path),
+        preflight=True,
+        starter_nb=starter_nb
+    )
+
+    assert graded_result['num_failed_cases'] == 1
+    assert graded_result['max_autograded_score'] == 5
+    assert graded_result['filename'] == 'no-test-cases.ipynb'
+    assert (tmp_path / 'no-test-cases-graded.html').exists()
+
+
+def test_grade_notebook_records_test_case_with_syntax_error(tmp_path):
+    nb = make_notebook('c = 3')
+    nb.cells.append(new_code_cell("_test_case = 'tc-02'\n_points = 10\n\nassert c == (3"))
+    notebook_path = tmp_path / 'broken-test-case.ipynb'
+    nbformat.write(nb, str(notebook_path))
+
+    graded_result = lambdagrader.grade_notebook(str(notebook_path), preflight=True)
+
+    assert [(o['test_case_name'], o['pass']) for o in graded_result['results']] == [('tc-01', True), ('tc-02', False)]
+    assert graded_result['learner_autograded_score'] == 5
+    assert graded_result['max_autograded_score'] == 15
+
+
+def test_grade_notebook_fails_deleted_test_case(tmp_path):
+    starter_with_two_test_cases = make_notebook('c = None')
+    starter_with_two_test_cases.cells.append(new_code_cell("_test_case = 'tc-02'\n_points = 10\n\nassert c > 0"))
+
+    notebook_path = tmp_path / 'deleted-test-case.ipynb'
+    nbformat.write(make_notebook('c = 3'), str(notebook_path))
+
+    graded_result = lambdagrader.grade_notebook(
+        str(notebook_path),
+        preflight=True,
+        starter_nb=starter_with_two_test_cases
+    )
+
+    assert [(o['test_case_name'], o['pass']) for o in graded_result['results']] == [('tc-01', True), ('tc-02', False)]
+    assert graded_result['max_autograded_score'] == 15
+    assert graded_result['preflight']['missing_test_cases'] == ['tc-02']
+
+
+def test_grade_notebook_flags_modified_test_case(tmp_path):
+    notebook_path = tmp_path / 'modified-test-case.ipynb'
+    nbformat.write(
+        make_notebook('c = 4', test_case_source="_test_case = 'tc-01'\n_points = 5\n\nassert c == 4"),
+        str(notebook_path)
+    )
+
+    graded_result = lambdagrader.grade_notebook(str(notebook_path), preflight=True, starter_nb=starter_nb)
+
+    assert graded_result['preflight']['test_cases_hash_matches'] is False
+
+    with open(tmp_path / 'modified-test-case-graded.html', encoding='utf-8') as f:
+        assert 'Test cases checksum does not match the assignment' in f.read()
+
+
+def test_indentation_change_is_not_unmodified_starter(tmp_path):
+    loop_starter_nb = make_notebook('c = 0\nfor i in range(3):\n    pass\nc += 1')
+    starter_graded_result = lambdagrader.create_graded_result_from_manifest(
+        lambdagrader.extract_test_cases_metadata_from_notebook(loop_starter_nb)
+    )
+    notebook_path = tmp_path / 'indented.ipynb'
+    nbformat.write(make_notebook('c = 0\nfor i in range(3):\n    pass\n    c += 1  # moved into the loop'), str(notebook_path))
+
+    assert lambdagrader.is_unmodified_starter(
+        make_notebook('c = 0\nfor i in range(3):  # loop\n    pass\n\nc   +=   1'),
+        loop_starter_nb
+    )
+
+    graded_result = lambdagrader.grade_notebook(
+        str(notebook_path),
+        preflight=True,
+        starter_nb=loop_starter_nb,
+        starter_graded_result=starter_graded_result
+    )
+
+    assert not graded_result['preflight']['is_unmodified_starter']
+    assert graded_result['num_passed_cases'] == 1
@@ -0,0 +1,46 @@
+import lambdagrader
+import nbformat
+from bs4 import BeautifulSoup
+from nbformat.v4 import new_notebook, new_code_cell, new_markdown_cell
+
+
+def test_profiling_reports_slowest_cells(tmp_path):
+    nb = new_notebook(cells=[
+        new_markdown_cell('# Exercise'),
+        new_code_cell('def slow_sum(n):\n    return sum(i * i for i in range(n))'),
+        new_code_cell('total = slow_sum(3_000_000)'),
+        new_code_cell("_test_case = 'tc-01'\n_points = 5\n\nassert total > 0"),
+    ])
+    notebook_path = tmp_path / 'profiling.ipynb'
+    nbformat.write(nb, str(notebook_path))
+
+    graded_result = lambdagrader.grade_notebook(
+        str(notebook_path),
+        profiling=True,
+        profiling_threshold_in_seconds=0.05
+    )
+
+    slowest_cell = graded_result['slowest_cells'][0]
+    assert 'cell_profiles' not in graded_result
+    assert slowest_cell['test_case_name'] is None
+    assert any(h['function'] == 'slow_sum' or h['function'] == '<genexpr>' for h in slowest_cell['hotspots'])
+
+    with open(tmp_path / 'profiling-graded.html', encoding='utf-8') as f:
+        soup = BeautifulSoup(f.read(), 'html.parser')
+
+    assert soup.find(id='_slowest_cells') is not None
+    assert soup.find(id=f"_slow_cell_{slowest_cell['execution_count']}") is not None
+
+
+def test_profiling_leaves_learner_cprofile_working(tmp_path):
+    nb = new_notebook(cells=[
+        new_code_cell("import cProfile\ncProfile.run('sum(range(1000))')\nprofiled = True"),
+        new_code_cell("_test_case = 'tc-01'\n_points = 5\n\nassert profiled"),
+    ])
+    notebook_path = tmp_path / 'learner-cprofile.ipynb'
+    nbformat.write(nb, str(notebook_path))
+
+    graded_result = lambdagrader.grade_notebook(str(notebook_path), profiling=True)
+
+    assert graded_result['results'][0]['pass'] is True
+    assert all(o['duration_in_seconds'] >= 0 for o in graded_result['slowest_cells'])
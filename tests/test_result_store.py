@@ -0,0 +1,83 @@
+import lambdagrader
+import os
+import json
+
+TEST_NOTEBOOKS_DIR = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    'test-notebooks',
+)
+
+with open(os.path.join(TEST_NOTEBOOKS_DIR, 'test-file-result.json')) as f:
+    sample_graded_result = json.load(f)
+
+
+def make_graded_result(learner_id, failed_test_cases):
+    gr = json.loads(json.dumps(sample_graded_result))
+    gr['learner_id'] = learner_id
+
+    for o in gr['results']:
+        o['pass'] = o['test_case_name'] not in failed_test_cases
+        o['points'] = o['available_points'] if o['pass'] else 0
+
+    return gr
+
+
+def test_insert_and_read_back(tmp_path):
+    conn = lambdagrader.open_result_store(str(tmp_path / 'results.db'))
+    submission_id = lambdagrader.insert_graded_result(conn, sample_graded_result, assignment_id='test-file')
+
+    gr = lambdagrader.get_graded_result(conn, submission_id)
+
+    assert gr['assignment_id'] == 'test-file'
+    assert gr['submission_notebook_hash'] == sample_graded_result['submission_notebook_hash']
+    assert gr['grader_platform'] == sample_graded_result['grader_platform']
+    assert gr['results'] == sample_graded_result['results']
+
+
+def test_query_failed_test_case_and_gradebook(tmp_path):
+    conn = lambdagrader.open_result_store(str(tmp_path / 'results.db'))
+    graded_results = [
+        make_graded_result(f'learner-{i}', ['tc-01'] if i % 2 else [])
+        for i in range(10)
+    ]
+    lambdagrader.insert_graded_results(conn, graded_results, assignment_id='test-file', batch_size=3)
+
+    failed = lambdagrader.find_submissions_by_test_case(conn, 'tc-01', did_pass=False)
+    assert sorted(o['learner_id'] for o in failed) == [f'learner-{i}' for i in (1, 3, 5, 7, 9)]
+
+    df_gradebook = lambdagrader.export_gradebook(conn, assignment_id='test-file')
+    assert len(df_gradebook) == 10
+    assert df_gradebook['points:tc-01'].sum() == 5 * 5
+
+
+def test_learner_id_and_pending_manual_grading(tmp_path):
+    conn = lambdagrader.open_result_store(str(tmp_path / 'results.db'))
+    graded_results = []
+
+    for i in range(3):
+        gr = json.loads(json.dumps(sample_graded_result))
+        gr['filename'] = f'submission-{i}.ipynb'
+        gr['results'][0]['test_case_name'] = 'filename'
+        gr['results'][-1]['pass'] = None if i == 0 else True
+        graded_results.append(gr)
+
+    lambdagrader.insert_graded_results(
+        conn,
+        graded_results,
+        assignment_id='test-file',
+        learner_id={f'submission-{i}.ipynb': f'learner-{i}' for i in range(3)}
+    )
+    lambdagrader.insert_graded_result(conn, graded_results[0], assignment_id='other', learner_id=lambda gr: 'learner-x')
+
+    assert [o['filename'] for o in lambdagrader.find_submissions(conn, learner_id='learner-1')] == ['submission-1.ipynb']
+    assert len(lambdagrader.find_submissions(conn, learner_id='learner-x')) == 1
+
+    test_case_name = graded_results[0]['results'][-1]['test_case_name']
+    pending = lambdagrader.find_submissions_by_test_case(conn, test_case_name, did_pass=None, assignment_id='test-file')
+    assert [o['learner_id'] for o in pending] == ['learner-0']
+    assert len(lambdagrader.find_submissions_by_test_case(conn, test_case_name, did_pass='any', assignment_id='test-file')) == 3
+
+    # a test case named like a submission column doesn't collide with it
+    df_gradebook = lambdagrader.export_gradebook(conn, assignment_id='test-file')
+    assert list(df_gradebook['filename']) == [f'submission-{i}.ipynb' for i in range(3)]
+    assert 'points:filename' in df_gradebook.columns
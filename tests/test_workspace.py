@@ -0,0 +1,98 @@
+import lambdagrader
+import os
+import nbformat
+from concurrent.futures import ThreadPoolExecutor
+from nbformat.v4 import new_notebook, new_code_cell
+
+
+def test_submission_working_dir_stages_and_cleans_up(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'sales.csv').write_text('a,b\n1,2\n')
+    (tmp_path / 'prices.csv').write_text('price\n10\n')
+
+    with lambdagrader.submission_working_dir([str(data_dir), str(tmp_path / 'prices.csv')]) as working_dir:
+        assert os.path.exists(os.path.join(working_dir, 'data', 'sales.csv'))
+        assert open(os.path.join(working_dir, 'prices.csv')).read() == 'price\n10\n'
+
+    assert not os.path.exists(working_dir)
+
+
+def test_grade_notebooks_concurrently_in_isolated_working_dirs(tmp_path):
+    (tmp_path / 'numbers.txt').write_text('1 2 3')
+    notebook_paths = []
+
+    for i in range(2):
+        nb = new_notebook(cells=[
+            new_code_cell(f"nums = [int(x) for x in open('numbers.txt').read().split()]\nopen('output.txt', 'w').write('{i}')"),
+            new_code_cell("_test_case = 'tc-01'\n_points = 5\n\nassert sum(nums) == 6"),
+        ])
+        notebook_path = str(tmp_path / f'submission-{i}.ipynb')
+        nbformat.write(nb, notebook_path)
+        notebook_paths.append(notebook_path)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        graded_results = list(executor.map(
+            lambda p: lambdagrader.grade_notebook(p, isolated=True, data_paths=[str(tmp_path / 'numbers.txt')]),
+            notebook_paths
+        ))
+
+    assert [gr['filename'] for gr in graded_results] == ['submission-0.ipynb', 'submission-1.ipynb']
+    assert all(gr['num_passed_cases'] == 1 for gr in graded_results)
+    assert not (tmp_path / 'output.txt').exists()
+    assert (tmp_path / 'numbers.txt').read_text() == '1 2 3'
+
+
+def test_staging_leaves_writable_sources_untouched(tmp_path):
+    src = tmp_path / 'sales.csv'
+    src.write_text('a,b\n1,2\n')
+    mode = os.stat(src).st_mode
+
+    method = lambdagrader.stage_data_file(str(src), str(tmp_path / 'staged.csv'), methods=('hardlink', 'copy'))
+    (tmp_path / 'staged.csv').write_text('overwritten')
+
+    # the grader can write to the source, so linking it would expose it to learner code
+    assert method == 'copy'
+    assert os.stat(src).st_mode == mode
+    assert src.read_text() == 'a,b\n1,2\n'
+
+
+def test_submission_working_dir_defaults_to_next_to_data(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'sales.csv').write_text('a,b\n1,2\n')
+    base_dir = tmp_path / 'scratch'
+    base_dir.mkdir()
+
+    with lambdagrader.submission_working_dir([str(data_dir)]) as working_dir:
+        assert os.path.dirname(working_dir) == str(tmp_path)
+
+    with lambdagrader.submission_working_dir([str(data_dir)], base_dir=str(base_dir)) as working_dir:
+        assert os.path.dirname(working_dir) == str(base_dir)
+
+
+def test_data_cache_is_linked_and_restored(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'sales.csv').write_text('a,b\n1,2\n')
+    mode = os.stat(data_dir / 'sales.csv').st_mode
+
+    with lambdagrader.data_cache([str(data_dir)]) as data_cache_dir:
+        cached_path = os.path.join(data_cache_dir, 'data', 'sales.csv')
+        assert not os.stat(cached_path).st_mode & 0o222
+
+        with lambdagrader.submission_working_dir(data_cache_dir=data_cache_dir) as working_dir:
+            staged_path = os.path.join(working_dir, 'data', 'sales.csv')
+            assert os.path.samefile(staged_path, cached_path)
+
+            # learner code running as the owner of the cache (or as root) can still write through the link
+            os.chmod(staged_path, 0o644)
+            with open(staged_path, 'w') as f:
+                f.write('overwritten')
+
+        assert open(cached_path).read() == 'a,b\n1,2\n'
+        assert not os.stat(cached_path).st_mode & 0o222
+
+    assert not os.path.exists(data_cache_dir)
+    assert os.stat(data_dir / 'sales.csv').st_mode == mode
+    assert (data_dir / 'sales.csv').read_text() == 'a,b\n1,2\n'